@@ -0,0 +1,84 @@
+"""Microbenchmark the per-log CPU cost of api-service ingest decoding.
+
+Measures decode + the single payload encode queue_log_write does, with no
+Redis, for FastAPI's original body parsing (json.loads + pydantic), the
+default model_validate_json path and the FAST_DECODE msgspec path:
+
+    python benchmarks/bench_decode.py --count 100000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "services", "api-service"))
+
+from app import main  # noqa: E402
+
+LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR"]
+SERVICES = ["api-gateway", "auth-service", "payment-service", "database", "cache"]
+
+
+def make_bodies(count: int) -> list:
+    now = datetime.utcnow()
+    return [
+        json.dumps({
+            "timestamp": (now - timedelta(milliseconds=i)).isoformat(),
+            "level": random.choice(LEVELS),
+            "service": random.choice(SERVICES),
+            "message": f"Benchmark message {i}",
+            "metadata": {"request_id": f"req-{i}"},
+        }).encode()
+        for i in range(count)
+    ]
+
+
+def before(body: bytes):
+    return main.LogEntry.model_validate(json.loads(body)).model_dump_json()
+
+
+def current(body: bytes):
+    log = main.decode_log(body)
+    if isinstance(log, main.LogRecord):
+        return main.record_encoder.encode(log)
+    return log.model_dump_json()
+
+
+def measure(fn, bodies: list, repeat: int) -> float:
+    """Best-of-repeat CPU microseconds per log"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.process_time()
+        for body in bodies:
+            fn(body)
+        best = min(best, time.process_time() - start)
+    return best / len(bodies) * 1e6
+
+
+def run(count: int, repeat: int) -> dict:
+    bodies = make_bodies(count)
+    results = {"count": count}
+
+    results["before_us_per_log"] = round(measure(before, bodies, repeat), 2)
+    main.FAST_DECODE = False
+    results["pydantic_us_per_log"] = round(measure(current, bodies, repeat), 2)
+    main.FAST_DECODE = True
+    results["msgspec_us_per_log"] = round(measure(current, bodies, repeat), 2)
+
+    results["speedup_vs_before"] = round(results["before_us_per_log"] / results["msgspec_us_per_log"], 2)
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    print(json.dumps(run(args.count, args.repeat), indent=2))
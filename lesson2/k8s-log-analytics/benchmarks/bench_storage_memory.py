@@ -0,0 +1,75 @@
+"""Compare Redis memory per million logs: key-per-log layout vs. Redis Streams.
+
+Writes --count logs through the api-service storage code for each backend and
+reports the used_memory delta. The target database is FLUSHED between runs, so
+point it at a scratch Redis or database index:
+
+    python benchmarks/bench_storage_memory.py --redis-url redis://localhost:6379/15 --count 1000000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "services", "api-service"))
+
+import redis.asyncio as redis  # noqa: E402
+
+from app import main  # noqa: E402
+
+LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR"]
+SERVICES = ["api-gateway", "auth-service", "payment-service", "database", "cache"]
+PIPELINE_SIZE = 1000
+
+
+async def fill(client: redis.Redis, backend: str, count: int) -> int:
+    main.STORAGE_BACKEND = backend
+    await client.flushdb()
+    before = (await client.info("memory"))["used_memory"]
+
+    start = datetime.utcnow() - timedelta(seconds=count / 1e6)
+    for offset in range(0, count, PIPELINE_SIZE):
+        pipe = client.pipeline(transaction=False)
+        pending = {}
+        for i in range(offset, min(offset + PIPELINE_SIZE, count)):
+            main.queue_log_write(pipe, main.LogEntry(
+                timestamp=start + timedelta(microseconds=i),
+                level=random.choice(LEVELS),
+                service=random.choice(SERVICES),
+                message=f"Benchmark message {i}",
+            ), pending)
+        main.queue_pending_writes(pipe, pending)
+        await pipe.execute()
+
+    after = (await client.info("memory"))["used_memory"]
+    await client.flushdb()
+    return after - before
+
+
+async def run(redis_url: str, count: int) -> dict:
+    client = redis.from_url(redis_url, decode_responses=True)
+    results = {}
+    for backend in ("keys", "streams"):
+        used = await fill(client, backend, count)
+        results[backend] = {
+            "used_memory_bytes": used,
+            "bytes_per_log": round(used / count, 1),
+            "mb_per_million_logs": round(used / count * 1e6 / 2**20, 1),
+        }
+    await client.close()
+    return {"count": count, "results": results}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--redis-url", default="redis://localhost:6379/15")
+    parser.add_argument("--count", type=int, default=1_000_000)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    print(json.dumps(asyncio.run(run(args.redis_url, args.count)), indent=2))
@@ -1,15 +1,22 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, ValidationError
+from typing import Annotated, List, Optional, Union
 import asyncio
+import heapq
+import hmac
+import json
 import logging
+import socket
 from datetime import datetime
+import msgspec
 from prometheus_client import Counter, Histogram, generate_latest
-from fastapi.responses import Response
+from fastapi.responses import PlainTextResponse, Response
 import redis.asyncio as redis
 import os
 
+from app import profiler
+
 # Configure structured logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -32,6 +39,14 @@ app.add_middleware(
 # Prometheus metrics
 log_counter = Counter('logs_ingested_total', 'Total logs ingested')
 query_duration = Histogram('query_duration_seconds', 'Query duration')
+# Per request stages; Redis reads are timed per round-trip
+STAGES = ("decode", "encode", "redis_write", "index_read", "log_read", "stream_read", "merge")
+stage_histogram = Histogram(
+    'api_stage_duration_seconds', 'Time spent in each request stage', ['stage'],
+    buckets=(.0001, .00025, .0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+)
+# Children bound once, since labels() takes a lock on every call
+stage_latency = {stage: stage_histogram.labels(stage=stage) for stage in STAGES}
 
 # Models
 class LogEntry(BaseModel):
@@ -41,6 +56,24 @@ class LogEntry(BaseModel):
     message: str
     metadata: Optional[dict] = {}
 
+class LogRecord(msgspec.Struct, kw_only=True):
+    """msgspec twin of LogEntry for FAST_DECODE; timestamps must be RFC 3339 strings"""
+    timestamp: datetime = msgspec.field(default_factory=datetime.utcnow)
+    level: Annotated[str, msgspec.Meta(pattern="^(DEBUG|INFO|WARNING|ERROR|CRITICAL)$")]
+    service: str
+    message: str
+    metadata: Optional[dict] = msgspec.field(default_factory=dict)
+
+class BulkError(BaseModel):
+    index: int
+    error: str
+
+class BulkResult(BaseModel):
+    accepted: int
+    rejected: int
+    ids: List[Optional[str]]  # aligned with the request; null for rejected items
+    errors: List[BulkError]
+
 class LogQuery(BaseModel):
     service: Optional[str] = None
     level: Optional[str] = None
@@ -51,6 +84,171 @@ class LogQuery(BaseModel):
 # Redis connection
 redis_client: Optional[redis.Redis] = None
 
+LOG_TTL = 3600  # 1 hour
+# "keys": one SETEX key per log plus sorted-set indexes
+# "streams": one Redis Stream per service, trimmed by MINID instead of TTLs
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "keys")
+STREAM_MAXLEN = int(os.getenv("STREAM_MAXLEN", "0"))  # 0 = trim by age only
+STREAM_SERVICES_KEY = "streams:services"
+MAX_BULK_RECORDS = int(os.getenv("MAX_BULK_RECORDS", "10000"))
+# Decode ingest bodies straight into LogRecord with msgspec instead of pydantic
+FAST_DECODE = os.getenv("FAST_DECODE", "false").lower() == "true"
+record_decoder = msgspec.json.Decoder(LogRecord)
+raw_array_decoder = msgspec.json.Decoder(List[msgspec.Raw])
+record_encoder = msgspec.json.Encoder()
+# /debug/profile needs this value in X-Debug-Token; empty disables the endpoint
+DEBUG_PROFILE_TOKEN = os.getenv("DEBUG_PROFILE_TOKEN", "")
+MAX_PROFILE_SECONDS = int(os.getenv("MAX_PROFILE_SECONDS", "60"))
+profile_lock = asyncio.Lock()
+
+def decode_log(raw) -> Union[LogEntry, LogRecord]:
+    """Validate one raw log; raises ValueError (pydantic or msgspec) when invalid"""
+    if FAST_DECODE and not isinstance(raw, dict):
+        return record_decoder.decode(raw)
+    if isinstance(raw, dict):
+        return LogEntry.model_validate(raw)
+    return LogEntry.model_validate_json(raw)
+
+def decode_error_message(error: ValueError) -> str:
+    if isinstance(error, ValidationError):
+        return str(error.errors()[0]["msg"])
+    return str(error)
+
+def stream_key(service: str) -> str:
+    return f"logs:{service}"
+
+def index_keys(service: str, level: str) -> List[str]:
+    """Sorted-set indexes (score = timestamp) a log is added to on ingest"""
+    return [
+        "idx:all",
+        f"idx:service:{service}",
+        f"idx:level:{level}",
+        f"idx:service:{service}:level:{level}",
+    ]
+
+def query_index_key(service: Optional[str], level: Optional[str]) -> str:
+    """Pick the single index that covers the query filters"""
+    if service and level:
+        return f"idx:service:{service}:level:{level}"
+    if service:
+        return f"idx:service:{service}"
+    if level:
+        return f"idx:level:{level}"
+    return "idx:all"
+
+def queue_log_write(pipe, log: Union[LogEntry, LogRecord], pending: dict) -> str:
+    """Queue the command that stores one log and return the key it is written to.
+
+    In streams mode the entry ID is the result of the first queued command.
+    Index and stream upkeep is collected in `pending` and queued once per
+    pipeline by queue_pending_writes.
+    """
+    if isinstance(log, LogRecord):
+        payload = record_encoder.encode(log)
+    else:
+        payload = log.model_dump_json()
+
+    if STORAGE_BACKEND == "streams":
+        key = stream_key(log.service)
+        # Stream IDs are ingest times in ms; drop entries older than the TTL
+        min_id = int((datetime.utcnow().timestamp() - LOG_TTL) * 1000)
+        pipe.xadd(key, {"level": log.level, "data": payload}, minid=min_id, approximate=True)
+        # stream key -> service
+        pending[key] = log.service
+        return key
+
+    score = log.timestamp.timestamp()
+    key = f"log:{log.service}:{score}"
+    pipe.setex(key, LOG_TTL, payload)
+    # index key -> {log key: score}
+    for index_key in index_keys(log.service, log.level):
+        pending.setdefault(index_key, {})[key] = score
+    return key
+
+def queue_pending_writes(pipe, pending: dict):
+    """Queue one index (or stream) update per distinct key after the logs themselves"""
+    if STORAGE_BACKEND == "streams":
+        if STREAM_MAXLEN:
+            for key in pending:
+                pipe.xtrim(key, maxlen=STREAM_MAXLEN, approximate=True)
+        if pending:
+            pipe.sadd(STREAM_SERVICES_KEY, *set(pending.values()))
+        return
+
+    # Index entries older than the log TTL point at expired keys
+    cutoff = datetime.utcnow().timestamp() - LOG_TTL
+    for index_key, members in pending.items():
+        pipe.zadd(index_key, members)
+        pipe.zremrangebyscore(index_key, "-inf", cutoff)
+        pipe.expire(index_key, LOG_TTL)
+
+def log_id(key: str, first_result) -> str:
+    if STORAGE_BACKEND == "streams":
+        return f"{key}/{first_result}"
+    return key
+
+async def query_log_keys(query: LogQuery) -> List[str]:
+    """Read newest-first from the sorted-set index matching the filters"""
+    logs = []
+    index_key = query_index_key(query.service, query.level)
+    max_score = query.end_time.timestamp() if query.end_time else "+inf"
+    min_score = query.start_time.timestamp() if query.start_time else "-inf"
+    offset = 0
+
+    # Skip index entries whose log key has expired
+    while len(logs) < query.limit:
+        with stage_latency["index_read"].time():
+            keys = await redis_client.zrevrangebyscore(
+                index_key, max_score, min_score,
+                start=offset, num=query.limit - len(logs)
+            )
+        if not keys:
+            break
+        with stage_latency["log_read"].time():
+            values = await redis_client.mget(keys)
+        expired = [key for key, value in zip(keys, values) if value is None]
+        logs.extend(value for value in values if value is not None)
+        offset += len(keys) - len(expired)
+        if expired:
+            await redis_client.zrem(index_key, *expired)
+
+    return logs
+
+async def query_log_streams(query: LogQuery) -> List[str]:
+    """XREVRANGE each matching service stream and merge newest-first"""
+    if query.service:
+        services = [query.service]
+    else:
+        services = sorted(await redis_client.smembers(STREAM_SERVICES_KEY))
+
+    max_id = str(int(query.end_time.timestamp() * 1000)) if query.end_time else "+"
+    min_id = str(int(query.start_time.timestamp() * 1000)) if query.start_time else "-"
+
+    async def read_stream(service: str) -> List[tuple]:
+        matches = []
+        upper = max_id
+        while len(matches) < query.limit:
+            with stage_latency["stream_read"].time():
+                entries = await redis_client.xrevrange(
+                    stream_key(service), max=upper, min=min_id, count=query.limit
+                )
+            for entry_id, fields in entries:
+                if not query.level or fields.get("level") == query.level:
+                    matches.append((entry_id, fields["data"]))
+            if len(entries) < query.limit:
+                break
+            upper = "(" + entries[-1][0]
+        return matches[:query.limit]
+
+    per_stream = await asyncio.gather(*(read_stream(service) for service in services))
+    with stage_latency["merge"].time():
+        newest = heapq.merge(
+            *per_stream,
+            key=lambda entry: tuple(int(part) for part in entry[0].split("-")),
+            reverse=True
+        )
+        return [data for _, data in list(newest)[:query.limit]]
+
 @app.on_event("startup")
 async def startup():
     global redis_client
@@ -91,18 +289,29 @@ async def readiness_check():
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"Not ready: {str(e)}")
 
-@app.post("/logs", status_code=201)
-async def ingest_log(log: LogEntry):
+@app.post("/logs", status_code=201, openapi_extra={
+    "requestBody": {"required": True, "content": {"application/json": {"schema": LogEntry.model_json_schema()}}}
+})
+async def ingest_log(request: Request):
     """Ingest a log entry"""
+    body = await request.body()
     try:
-        # Store in Redis with TTL
-        log_key = f"log:{log.service}:{log.timestamp.timestamp()}"
+        with stage_latency["decode"].time():
+            log = decode_log(body)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=decode_error_message(e))
+
+    try:
+        log_key = None
         if redis_client:
-            await redis_client.setex(
-                log_key,
-                3600,  # 1 hour TTL
-                log.model_dump_json()
-            )
+            with stage_latency["encode"].time():
+                pipe = redis_client.pipeline(transaction=False)
+                pending = {}
+                key = queue_log_write(pipe, log, pending)
+                queue_pending_writes(pipe, pending)
+            with stage_latency["redis_write"].time():
+                results = await pipe.execute()
+            log_key = log_id(key, results[0])
         
         log_counter.inc()
         logger.info(f"Log ingested: {log.service} - {log.level}")
@@ -112,26 +321,77 @@ async def ingest_log(log: LogEntry):
         logger.error(f"Failed to ingest log: {e}")
         raise HTTPException(status_code=500, detail="Ingestion failed")
 
+async def read_bulk_records(request: Request) -> list:
+    """Split a JSON array or NDJSON body into raw records"""
+    body = await request.body()
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        return [line for line in body.split(b"\n") if line.strip()]
+
+    try:
+        if FAST_DECODE:
+            # Items stay undecoded until decode_log validates them one by one
+            records = raw_array_decoder.decode(body)
+        else:
+            records = json.loads(body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON body: {e}")
+    if not isinstance(records, list):
+        raise HTTPException(status_code=400, detail="Bulk body must be a JSON array or NDJSON")
+    return records
+
+@app.post("/logs/bulk", status_code=201)
+async def ingest_logs_bulk(request: Request) -> BulkResult:
+    """Ingest many log entries through a single Redis pipeline"""
+    records = await read_bulk_records(request)
+    if len(records) > MAX_BULK_RECORDS:
+        raise HTTPException(status_code=413, detail=f"Bulk request exceeds {MAX_BULK_RECORDS} records")
+
+    logs = []
+    errors = []
+    with stage_latency["decode"].time():
+        for index, record in enumerate(records):
+            try:
+                logs.append((index, decode_log(record)))
+            except ValueError as e:
+                errors.append(BulkError(index=index, error=decode_error_message(e)))
+
+    ids: List[Optional[str]] = [None] * len(records)
+    try:
+        if redis_client and logs:
+            with stage_latency["encode"].time():
+                pipe = redis_client.pipeline(transaction=False)
+                queued = []
+                pending = {}
+                for index, log in logs:
+                    position = len(pipe)
+                    queued.append((index, queue_log_write(pipe, log, pending), position))
+                queue_pending_writes(pipe, pending)
+            with stage_latency["redis_write"].time():
+                results = await pipe.execute()
+            for index, key, position in queued:
+                ids[index] = log_id(key, results[position])
+
+        log_counter.inc(len(logs))
+        logger.info(f"Bulk ingested {len(logs)} logs, rejected {len(errors)}")
+
+        return BulkResult(accepted=len(logs), rejected=len(errors), ids=ids, errors=errors)
+    except Exception as e:
+        logger.error(f"Failed to ingest bulk logs: {e}")
+        raise HTTPException(status_code=500, detail="Ingestion failed")
+
 @app.post("/logs/query")
 async def query_logs(query: LogQuery):
     """Query logs with filters"""
     with query_duration.time():
         try:
-            # Simulated query - in production, use proper database
             logs = []
             
             if redis_client:
-                pattern = f"log:{query.service or '*'}:*"
-                keys = []
-                async for key in redis_client.scan_iter(match=pattern):
-                    keys.append(key)
-                    if len(keys) >= query.limit:
-                        break
-                
-                for key in keys:
-                    log_data = await redis_client.get(key)
-                    if log_data:
-                        logs.append(log_data)
+                if STORAGE_BACKEND == "streams":
+                    logs = await query_log_streams(query)
+                else:
+                    logs = await query_log_keys(query)
             
             return {
                 "total": len(logs),
@@ -142,6 +402,28 @@ async def query_logs(query: LogQuery):
             logger.error(f"Query failed: {e}")
             raise HTTPException(status_code=500, detail="Query failed")
 
+@app.get("/debug/profile", response_class=PlainTextResponse)
+async def debug_profile(
+    seconds: float = Query(default=10, gt=0),
+    hz: int = Query(default=100, ge=1, le=1000),
+    x_debug_token: Optional[str] = Header(default=None)
+):
+    """Sample every thread's stack for `seconds` and return collapsed stacks (flamegraph input)"""
+    if not DEBUG_PROFILE_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_debug_token or not hmac.compare_digest(x_debug_token, DEBUG_PROFILE_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid debug token")
+    if seconds > MAX_PROFILE_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be at most {MAX_PROFILE_SECONDS}")
+    if profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    async with profile_lock:
+        stacks = await asyncio.to_thread(profiler.sample_stacks, seconds, hz)
+    return PlainTextResponse(
+        profiler.collapse(stacks),
+        headers={"Content-Disposition": f'attachment; filename="{socket.gethostname()}-profile.folded"'}
+    )
+
 @app.get("/metrics")
 async def metrics():
     """Prometheus metrics endpoint"""
@@ -152,8 +434,16 @@ async def get_stats():
     """Get system statistics"""
     try:
         total_keys = 0
-        if redis_client:
-            total_keys = await redis_client.dbsize()
+        if redis_client and STORAGE_BACKEND == "streams":
+            services = await redis_client.smembers(STREAM_SERVICES_KEY)
+            pipe = redis_client.pipeline(transaction=False)
+            for service in services:
+                pipe.xlen(stream_key(service))
+            total_keys = sum(await pipe.execute())
+        elif redis_client:
+            # idx:all holds every stored log; entries past the TTL point at expired keys
+            cutoff = datetime.utcnow().timestamp() - LOG_TTL
+            total_keys = await redis_client.zcount("idx:all", cutoff, "+inf")
         
         return {
             "total_logs": total_keys,
@@ -0,0 +1,273 @@
+"""Benchmark /logs/tail fan-out with many concurrent tail clients, reporting JSON.
+
+Opens --clients SSE streams on GET /logs/tail, each filtered on a random
+service and/or level, then ingests logs open-loop at --rate logs/second
+through POST /logs/batch. The same ingest runs once with no tail clients
+first, so the two ingest latency distributions show what tailing costs the
+write path.
+
+A --slow fraction of the clients connect but never read. Their queues fill
+and drop the oldest lines; the fast clients should still see every matching
+log. Delivery latency is measured from the send time embedded in each message.
+
+Against a running processor:
+
+    python benchmarks/bench_tail.py --url http://localhost:8080 --clients 1000
+
+Locally, with the processor behind uvicorn in a child process (fakeredis and
+an embedded Postgres):
+
+    pip install httpx fakeredis pgserver uvicorn
+    python benchmarks/bench_tail.py --local --clients 1000 --rate 1000
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import multiprocessing
+import random
+import re
+import socket
+import tempfile
+import time
+from collections import Counter
+
+import httpx
+
+from load_test import LEVELS, SERVICES, HdrHistogram, git_commit, local_processor, ndjson
+
+
+DROPPED_EVENT = re.compile(rb"event: dropped\ndata: (\d+)")
+SENT_AT = re.compile(rb"tail-bench ([0-9.]+)")
+
+
+def pick_filter(rng: random.Random) -> dict:
+    """One in ten clients tails everything, the rest filter on service, level or both"""
+    kind = rng.random()
+    if kind < 0.1:
+        return {}
+    if kind < 0.4:
+        return {"service": rng.choice(SERVICES)}
+    if kind < 0.6:
+        return {"level": rng.choice(LEVELS)}
+    return {"service": rng.choice(SERVICES), "level": rng.choice(LEVELS)}
+
+
+def matches(tail_filter: dict, log: dict) -> bool:
+    return all(log[field] == value for field, value in tail_filter.items())
+
+
+class TailClient:
+    def __init__(self, tail_filter: dict, slow: bool):
+        self.filter = tail_filter
+        self.slow = slow
+        self.received = 0
+        self.dropped = 0
+        self.connected = asyncio.Event()
+
+    async def run(self, client: httpx.AsyncClient, histogram: HdrHistogram):
+        async with client.stream("GET", "/logs/tail", params=self.filter) as response:
+            response.raise_for_status()
+            self.connected.set()
+            if self.slow:
+                # Never read: the server's socket buffer fills, then this client's queue
+                await asyncio.Event().wait()
+            pending = b""
+            async for chunk in response.aiter_bytes():
+                # Count whole events per chunk and time only the newest one, so
+                # a thousand clients don't spend the CPU the server needs
+                events, _, pending = (pending + chunk).rpartition(b"\n\n")
+                if not events:
+                    continue
+                dropped = DROPPED_EVENT.findall(events)
+                self.dropped += sum(int(count) for count in dropped)
+                lines = events.count(b"\ndata: ") + events.startswith(b"data: ")
+                self.received += lines - len(dropped)
+                newest = events.rfind(b"data: {")
+                if newest >= 0:
+                    sent_at = SENT_AT.search(events, newest)
+                    if sent_at:
+                        histogram.record(time.time() - float(sent_at.group(1)))
+
+
+async def ingest(client: httpx.AsyncClient, args, rng: random.Random) -> dict:
+    """Send --rate logs/second in batches for --duration; return the logs sent and batch latency"""
+    histogram = HdrHistogram()
+    statuses = Counter()
+    sent = []
+    pending = set()
+    interval = args.batch_size / args.rate
+    batches = int(args.duration / interval)
+
+    async def send(scheduled_at: float, logs: list):
+        response = await client.post(
+            "/logs/batch", content=ndjson(logs), headers={"Content-Type": "application/x-ndjson"}
+        )
+        histogram.record(time.perf_counter() - scheduled_at)
+        statuses[str(response.status_code)] += 1
+        if response.status_code < 400:
+            sent.extend(logs)
+
+    start = time.perf_counter()
+    for i in range(batches):
+        scheduled_at = start + i * interval
+        delay = scheduled_at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        logs = []
+        for _ in range(args.batch_size):
+            logs.append({
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime()),
+                "level": rng.choice(LEVELS),
+                "service": rng.choice(SERVICES),
+                "message": f"tail-bench {time.time()}",
+            })
+        task = asyncio.create_task(send(scheduled_at, logs))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+    await asyncio.gather(*pending)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "logs": sent,
+        "report": {
+            "batches": batches,
+            "status": dict(statuses),
+            "logs_per_second": round(len(sent) / elapsed, 1),
+            "batch_latency_ms": histogram.summary_ms(),
+        }
+    }
+
+
+async def run_tail(client: httpx.AsyncClient, args) -> dict:
+    rng = random.Random(args.seed)
+    tails = [TailClient(pick_filter(rng), rng.random() < args.slow) for _ in range(args.clients)]
+    delivery = HdrHistogram()
+    tasks = [asyncio.create_task(tail.run(client, delivery)) for tail in tails]
+    try:
+        start = time.perf_counter()
+        await asyncio.wait_for(
+            asyncio.gather(*(tail.connected.wait() for tail in tails)), args.connect_timeout
+        )
+        connect_seconds = time.perf_counter() - start
+
+        result = await ingest(client, args, rng)
+        # Let the last lines reach their clients
+        await asyncio.sleep(args.drain)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    fast = [tail for tail in tails if not tail.slow]
+    expected = sum(matches(tail.filter, log) for tail in fast for log in result["logs"])
+    received = sum(tail.received for tail in fast)
+    return {
+        "ingest": result["report"],
+        "clients": len(tails),
+        "slow_clients": len(tails) - len(fast),
+        "connect_seconds": round(connect_seconds, 3),
+        "fast_clients_expected": expected,
+        "fast_clients_received": received,
+        "fast_clients_delivery_ratio": round(received / expected, 4) if expected else 1.0,
+        "fast_clients_dropped": sum(tail.dropped for tail in fast),
+        "delivery_latency_ms": delivery.summary_ms(),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve_local(workdir: str, port: int):
+    """Child process: the processor behind uvicorn, with fakeredis and an embedded Postgres"""
+    import uvicorn
+
+    async def serve():
+        async with local_processor(workdir) as (transport, _, _):
+            server = uvicorn.Server(uvicorn.Config(
+                transport.app, host="127.0.0.1", port=port, lifespan="off", log_level="warning"
+            ))
+            await server.serve()
+
+    asyncio.run(serve())
+
+
+@contextlib.asynccontextmanager
+async def local_server(workdir: str, timeout: float):
+    """Run the processor in its own process, so the clients' CPU doesn't skew the server"""
+    port = free_port()
+    server = multiprocessing.Process(target=serve_local, args=(workdir, port), daemon=True)
+    server.start()
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        async with httpx.AsyncClient(base_url=base_url) as client:
+            deadline = time.perf_counter() + timeout
+            while True:
+                try:
+                    if (await client.get("/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.perf_counter() > deadline or not server.is_alive():
+                    raise RuntimeError("local processor did not start")
+                await asyncio.sleep(0.2)
+        yield base_url
+    finally:
+        # SIGTERM lets uvicorn exit and local_processor stop Postgres
+        server.terminate()
+        server.join(30)
+        if server.is_alive():
+            server.kill()
+
+
+async def run(args) -> dict:
+    async with contextlib.AsyncExitStack() as stack:
+        if args.local:
+            workdir = stack.enter_context(tempfile.TemporaryDirectory())
+            base_url = await stack.enter_async_context(local_server(workdir, args.connect_timeout))
+        else:
+            base_url = args.url
+
+        connections = args.clients + args.concurrency
+        client = await stack.enter_async_context(httpx.AsyncClient(
+            base_url=base_url,
+            timeout=httpx.Timeout(args.timeout, read=None),
+            limits=httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+        ))
+
+        baseline = (await ingest(client, args, random.Random(args.seed)))["report"]
+        tail = await run_tail(client, args)
+
+    return {
+        "target": "local" if args.local else args.url,
+        "commit": git_commit(),
+        "rate": args.rate,
+        "baseline_ingest": baseline,
+        "with_tail_clients": tail,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", default="http://localhost:8080")
+    target.add_argument("--local", action="store_true", help="run the processor in-process")
+    parser.add_argument("--clients", type=int, default=1000, help="concurrent tail streams")
+    parser.add_argument("--slow", type=float, default=0.1, help="fraction of clients that never read")
+    parser.add_argument("--rate", type=float, default=500, help="logs/second ingested")
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=16, help="ingest connections")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of ingest per phase")
+    parser.add_argument("--drain", type=float, default=2, help="seconds to wait for the last deliveries")
+    parser.add_argument("--connect-timeout", type=float, default=60)
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
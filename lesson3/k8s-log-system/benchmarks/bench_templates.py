@@ -0,0 +1,183 @@
+"""Replay a log corpus through the processor's flush path with LOG_ENCODING=plain and =template.
+
+Each encoding runs in its own process against a fresh embedded Postgres
+(pip install pgserver fakeredis). The corpus is written in flush-sized
+batches. The report shows insert throughput, the bytes the logs table and its
+dictionaries take, and whether every message read back through search SQL
+matches the original.
+
+    python benchmarks/bench_templates.py --count 200000
+    python benchmarks/bench_templates.py --corpus logs.ndjson   # replay a real NDJSON dump
+
+Without --corpus, the logs mix the producer's LOG_TEMPLATES (constant
+messages) with parameterized lines of the kind services usually emit.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from load_test import git_commit, local_processor  # noqa: E402
+
+PRODUCER_TEMPLATES = [
+    ("INFO", "api-gateway", "Request processed successfully"),
+    ("INFO", "auth-service", "User authenticated"),
+    ("WARNING", "payment-service", "Payment retry attempt"),
+    ("ERROR", "database", "Connection pool exhausted"),
+    ("INFO", "cache", "Cache hit"),
+    ("WARNING", "api-gateway", "Rate limit approaching"),
+    ("ERROR", "email-service", "SMTP connection failed"),
+    ("INFO", "notification", "Push notification sent"),
+]
+PARAMETERIZED = [
+    ("INFO", "api-gateway", lambda r: f"GET /api/v1/orders/{r.randint(1, 10**6)} 200 {r.randint(1, 900)}ms"),
+    ("INFO", "auth-service", lambda r: f"User user-{r.randint(1, 1000)} authenticated from 10.0.{r.randint(0, 255)}.{r.randint(1, 254)}"),
+    ("WARNING", "payment-service", lambda r: f"Payment txn-{r.getrandbits(32):08x} retry attempt {r.randint(1, 5)} of 5"),
+    ("ERROR", "database", lambda r: f"Connection pool exhausted: {r.randint(50, 100)} of 100 connections in use, {r.randint(1, 40)} waiting"),
+    ("INFO", "cache", lambda r: f"Cache {r.choice(['hit', 'miss'])} for key session:{r.getrandbits(48):012x}"),
+    ("INFO", "notification", lambda r: f"Push notification sent to device {r.getrandbits(64):016x} in {r.randint(5, 400)}ms"),
+]
+
+
+def make_corpus(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    start = datetime.utcnow() - timedelta(minutes=30)
+    logs = []
+    for i in range(count):
+        if rng.random() < 0.5:
+            level, service, message = rng.choice(PRODUCER_TEMPLATES)
+        else:
+            level, service, render = rng.choice(PARAMETERIZED)
+            message = render(rng)
+        logs.append({
+            "timestamp": (start + timedelta(milliseconds=i)).isoformat(),
+            "level": level,
+            "service": service,
+            "message": message,
+            "trace_id": f"trace-{rng.randrange(10000)}",
+            "user_id": f"user-{rng.randint(1, 1000)}",
+        })
+    return logs
+
+
+def load_corpus(path: str, count: int) -> list:
+    logs = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                logs.append(json.loads(line))
+                if count and len(logs) >= count:
+                    break
+    return logs
+
+
+async def replay(encoding: str, logs: list, batch_size: int) -> dict:
+    os.environ["LOG_ENCODING"] = encoding
+    os.environ["WAL_DIR"] = ""
+    with tempfile.TemporaryDirectory() as workdir:
+        async with local_processor(workdir):
+            import main
+            from sqlalchemy import text
+
+            # Mining and dictionary lookups, timed apart from the COPY
+            encode_seconds = 0.0
+            if main.log_encoder:
+                encode = main.log_encoder.encode
+
+                async def timed_encode(*args):
+                    nonlocal encode_seconds
+                    started = time.perf_counter()
+                    try:
+                        return await encode(*args)
+                    finally:
+                        encode_seconds += time.perf_counter() - started
+
+                main.log_encoder.encode = timed_encode
+
+            start = time.perf_counter()
+            for offset in range(0, len(logs), batch_size):
+                await main.bulk_write_logs(logs[offset:offset + batch_size])
+            elapsed = time.perf_counter() - start
+
+            async with main.engine.connect() as conn:
+                # (heap + TOAST bytes, index bytes) per table
+                sizes = {}
+                for table in ("logs", "log_templates", "log_services", "log_levels"):
+                    result = await conn.execute(text(
+                        "SELECT pg_table_size(CAST(:table AS regclass)), pg_indexes_size(CAST(:table AS regclass))"
+                    ), {"table": table})
+                    sizes[table] = tuple(result.one())
+                rows = (await conn.execute(main.select_logs().order_by(main.LogModel.id))).all()
+            exact = len(rows) == len(logs) and all(
+                row.message == log["message"] and row.service == log["service"] and row.level == log["level"]
+                for row, log in zip(rows, logs)
+            )
+
+            table_bytes = sum(size[0] for size in sizes.values())
+            index_bytes = sum(size[1] for size in sizes.values())
+            result = {
+                "logs_per_second": round(len(logs) / elapsed),
+                "elapsed_seconds": round(elapsed, 3),
+                "encode_seconds": round(encode_seconds, 3),
+                "copy_logs_per_second": round(len(logs) / (elapsed - encode_seconds)),
+                "table_bytes": table_bytes,
+                "index_bytes": index_bytes,
+                "bytes_per_log": round((table_bytes + index_bytes) / len(logs), 1),
+                "dictionary_bytes": sum(sum(size) for table, size in sizes.items() if table != "logs"),
+                "messages_exact": exact,
+            }
+            if main.log_encoder:
+                result["templates"] = main.log_encoder.miner.clusters
+                result["template_encoded_share"] = round(main.log_encoder.encoded / len(logs), 4)
+            return result
+
+
+def run_child(encoding: str, logs: list, batch_size: int, results):
+    results.put(asyncio.run(replay(encoding, logs, batch_size)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=200000, help="logs to replay (0 = whole --corpus)")
+    parser.add_argument("--corpus", help="NDJSON file of logs to replay instead of the synthetic mix")
+    parser.add_argument("--batch-size", type=int, default=5000, help="logs per flush")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    logs = load_corpus(args.corpus, args.count) if args.corpus else make_corpus(args.count, args.seed)
+    # Fresh interpreter per encoding, since main reads LOG_ENCODING at import
+    context = multiprocessing.get_context("spawn")
+    report = {
+        "commit": git_commit(),
+        "corpus": args.corpus or "synthetic",
+        "logs": len(logs),
+        "message_bytes": sum(len(log["message"].encode()) for log in logs),
+        "batch_size": args.batch_size,
+    }
+    for encoding in ("plain", "template"):
+        results = context.Queue()
+        child = context.Process(target=run_child, args=(encoding, logs, args.batch_size, results))
+        child.start()
+        report[encoding] = results.get()
+        child.join()
+
+    plain, template = report["plain"], report["template"]
+    report["compression_ratio"] = round(
+        (plain["table_bytes"] + plain["index_bytes"]) / (template["table_bytes"] + template["index_bytes"]), 2
+    )
+    report["table_compression_ratio"] = round(plain["table_bytes"] / template["table_bytes"], 2)
+    report["insert_speedup"] = round(template["logs_per_second"] / plain["logs_per_second"], 2)
+    report["copy_speedup"] = round(template["copy_logs_per_second"] / plain["copy_logs_per_second"], 2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""Async load test for the log-processor API, reporting JSON.
+
+Drives POST /logs, POST /logs/batch, GET /logs/search and GET /logs/trace
+either closed-loop (--concurrency workers back to back) or open-loop
+(--rate requests/second on a fixed schedule, latency measured from each
+request's scheduled time so a stalled server is not hidden). Reports
+throughput and HDR-style latency percentiles per scenario.
+
+Against a running processor (docker-compose or a port-forward):
+
+    python benchmarks/load_test.py --url http://localhost:8080 --rate 500 --duration 30
+
+In-process, for numbers that are comparable between commits: the processor
+runs behind an ASGI transport with fakeredis and an embedded Postgres
+(pgserver, no TimescaleDB or pg_trgm):
+
+    pip install httpx fakeredis pgserver
+    python benchmarks/load_test.py --local --concurrency 32 --duration 10
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+import httpx
+
+APP_DIR = os.path.join(os.path.dirname(__file__), "..", "services", "log-processor", "app")
+
+LEVELS = ["INFO", "WARNING", "ERROR", "DEBUG"]
+SERVICES = ["api-gateway", "auth-service", "payment-service", "database", "cache"]
+WORDS = ["request", "processed", "payment", "retry", "cache", "timeout", "user", "authenticated"]
+TRACE_IDS = 1000
+
+
+class HdrHistogram:
+    """Log-linear histogram of integer microseconds with 2 significant digits.
+
+    Like HdrHistogram, each power-of-two range is split into 128 linear
+    sub-buckets, so any recorded value is reported within 1%.
+    """
+
+    SUB_BUCKET_BITS = 8
+
+    def __init__(self):
+        self.counts = defaultdict(int)
+        self.total = 0
+        self.sum = 0
+        self.max = 0
+
+    def record(self, seconds: float):
+        value = max(0, int(seconds * 1e6))
+        shift = max(0, value.bit_length() - self.SUB_BUCKET_BITS)
+        self.counts[(shift, value >> shift)] += 1
+        self.total += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def percentile(self, p: float) -> int:
+        if not self.total:
+            return 0
+        rank = math.ceil(self.total * p / 100)
+        seen = 0
+        for shift, sub_bucket in sorted(self.counts):
+            seen += self.counts[(shift, sub_bucket)]
+            if seen >= rank:
+                return min(self.max, ((sub_bucket + 1) << shift) - 1)
+        return self.max
+
+    def summary_ms(self) -> dict:
+        summary = {f"p{p:g}": round(self.percentile(p) / 1000, 3) for p in (50, 90, 99, 99.9)}
+        summary["mean"] = round(self.sum / self.total / 1000, 3) if self.total else 0
+        summary["max"] = round(self.max / 1000, 3)
+        return summary
+
+
+def make_log(rng: random.Random) -> dict:
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime()),
+        "level": rng.choice(LEVELS),
+        "service": rng.choice(SERVICES),
+        "message": " ".join(rng.choices(WORDS, k=4)),
+        "trace_id": f"trace-{rng.randrange(TRACE_IDS)}",
+        "user_id": f"user-{rng.randint(1, 1000)}",
+    }
+
+
+def ndjson(logs: list) -> bytes:
+    return b"\n".join(json.dumps(log).encode() for log in logs)
+
+
+# Each scenario sends one request and returns (status code, logs carried)
+
+async def ingest(client: httpx.AsyncClient, rng: random.Random, args) -> tuple:
+    response = await client.post("/logs", json=make_log(rng))
+    return response.status_code, 1
+
+
+async def batch(client: httpx.AsyncClient, rng: random.Random, args) -> tuple:
+    logs = [make_log(rng) for _ in range(args.batch_size)]
+    response = await client.post(
+        "/logs/batch", content=ndjson(logs), headers={"Content-Type": "application/x-ndjson"}
+    )
+    return response.status_code, len(logs)
+
+
+async def search(client: httpx.AsyncClient, rng: random.Random, args) -> tuple:
+    params = {"service": rng.choice(SERVICES), "level": rng.choice(LEVELS), "limit": 100}
+    if rng.random() < 0.5:
+        params["q"] = rng.choice(WORDS)
+    response = await client.get("/logs/search", params=params)
+    return response.status_code, 0
+
+
+async def trace(client: httpx.AsyncClient, rng: random.Random, args) -> tuple:
+    response = await client.get(f"/logs/trace/trace-{rng.randrange(TRACE_IDS)}")
+    return response.status_code, 0
+
+
+SCENARIOS = {"ingest": ingest, "batch": batch, "search": search, "trace": trace}
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario, args, duration: float) -> dict:
+    rng = random.Random(args.seed)
+    histogram = HdrHistogram()
+    statuses = Counter()
+    totals = {"requests": 0, "logs": 0}
+    slots = asyncio.Semaphore(args.concurrency)
+
+    async def send(scheduled_at: float):
+        async with slots:
+            try:
+                status, logs = await scenario(client, rng, args)
+                statuses[str(status)] += 1
+                if status < 400:
+                    totals["logs"] += logs
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+        histogram.record(time.perf_counter() - scheduled_at)
+        totals["requests"] += 1
+
+    start = time.perf_counter()
+    deadline = start + duration
+
+    def more(issued: int) -> bool:
+        return time.perf_counter() < deadline and not (args.requests and issued >= args.requests)
+
+    if args.rate:
+        # Open loop: request i is due at start + i / rate, whether or not earlier ones finished
+        pending = set()
+        issued = 0
+        while more(issued):
+            scheduled_at = start + issued / args.rate
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.create_task(send(scheduled_at))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            issued += 1
+        await asyncio.gather(*pending)
+    else:
+        issued = [0]
+
+        async def worker():
+            while more(issued[0]):
+                issued[0] += 1
+                await send(time.perf_counter())
+
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+
+    elapsed = time.perf_counter() - start
+    errors = sum(count for status, count in statuses.items() if not status.isdigit() or int(status) >= 400)
+    return {
+        "requests": totals["requests"],
+        "errors": errors,
+        "status": dict(statuses),
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(totals["requests"] / elapsed, 1),
+        "logs_per_second": round(totals["logs"] / elapsed, 1),
+        "latency_ms": histogram.summary_ms(),
+    }
+
+
+async def prefill(client: httpx.AsyncClient, args, flush):
+    """Load logs for search/trace scenarios and wait until they are in the database"""
+    rng = random.Random(args.seed + 1)
+    for offset in range(0, args.prefill, 1000):
+        logs = [make_log(rng) for _ in range(min(1000, args.prefill - offset))]
+        response = await client.post(
+            "/logs/batch", content=ndjson(logs), headers={"Content-Type": "application/x-ndjson"}
+        )
+        response.raise_for_status()
+    await flush()
+
+
+@contextlib.asynccontextmanager
+async def local_processor(workdir: str):
+    """Run the processor in this process against fakeredis and an embedded Postgres"""
+    import fakeredis
+    import pgserver
+
+    server = pgserver.get_server(os.path.join(workdir, "pg"), cleanup_mode="stop")
+    # postgresql://postgres:@/postgres?host=<socket dir>
+    os.environ["DATABASE_URL"] = server.get_uri().replace("postgresql://postgres:@", "postgresql+asyncpg://postgres@")
+    os.environ["WAL_DIR"] = os.path.join(workdir, "wal")
+    os.environ["KAFKA_BOOTSTRAP_SERVERS"] = ""
+    sys.path.insert(0, APP_DIR)
+    import main
+
+    class FakeRedisModule:
+        @staticmethod
+        def from_url(url, **kwargs):
+            return fakeredis.FakeAsyncRedis(**kwargs)
+
+    main.aioredis = FakeRedisModule
+    await main.startup_event()
+
+    async def flush():
+        while main.log_buffer or main.inflight_logs:
+            await main.flush_buffer()
+            await asyncio.sleep(0.05)
+
+    try:
+        yield httpx.ASGITransport(app=main.app), "http://processor", flush
+    finally:
+        await main.shutdown_event()
+        await main.engine.dispose()
+        server.cleanup()
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+async def run(args) -> dict:
+    async with contextlib.AsyncExitStack() as stack:
+        if args.local:
+            workdir = stack.enter_context(tempfile.TemporaryDirectory())
+            transport, base_url, flush = await stack.enter_async_context(local_processor(workdir))
+        else:
+            transport, base_url = None, args.url
+
+            async def flush():
+                # Buffered logs reach the database within FLUSH_MAX_AGE_MS
+                await asyncio.sleep(args.settle)
+
+        client = await stack.enter_async_context(httpx.AsyncClient(
+            base_url=base_url,
+            transport=transport,
+            timeout=args.timeout,
+            limits=httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        ))
+
+        if {"search", "trace"} & set(args.scenarios) and args.prefill:
+            await prefill(client, args, flush)
+
+        results = {}
+        for name in args.scenarios:
+            if args.warmup:
+                await run_scenario(client, SCENARIOS[name], args, args.warmup)
+            results[name] = await run_scenario(client, SCENARIOS[name], args, args.duration)
+
+    return {
+        "target": "local" if args.local else args.url,
+        "commit": git_commit(),
+        "mode": f"open-loop {args.rate}/s" if args.rate else "closed-loop",
+        "concurrency": args.concurrency,
+        "scenarios": results,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", default="http://localhost:8080")
+    target.add_argument("--local", action="store_true", help="run the processor in-process")
+    parser.add_argument("--scenarios", type=lambda value: value.split(","), default=list(SCENARIOS),
+                        help=f"comma-separated, run one after another: {','.join(SCENARIOS)}")
+    parser.add_argument("--rate", type=float, default=0, help="open-loop requests/second; 0 = closed loop")
+    parser.add_argument("--concurrency", type=int, default=16, help="max requests in flight")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per scenario")
+    parser.add_argument("--requests", type=int, default=0, help="stop a scenario after this many requests")
+    parser.add_argument("--warmup", type=float, default=2, help="unmeasured seconds before each scenario")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--prefill", type=int, default=10000, help="logs loaded before search/trace")
+    parser.add_argument("--settle", type=float, default=6, help="seconds to wait for remote flushes")
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
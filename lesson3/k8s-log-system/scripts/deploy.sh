@@ -22,6 +22,13 @@ kubectl apply -f k8s/base/log-processor-statefulset.yaml
 kubectl apply -f k8s/base/log-producer-deployment.yaml
 kubectl apply -f k8s/base/frontend-deployment.yaml
 
+# Optional Parquet cold tier; needs a ReadWriteMany storage class (kind has none)
+if [ "${COLD_TIER:-false}" = "true" ]; then
+    kubectl apply -f k8s/overlays/cold-tier/cold-storage.yaml
+    kubectl patch statefulset log-processor -n log-system \
+        --patch-file k8s/overlays/cold-tier/log-processor-patch.yaml
+fi
+
 # Apply autoscaling and policies
 kubectl apply -f k8s/base/hpa.yaml
 kubectl apply -f k8s/base/pdb.yaml
@@ -14,17 +14,16 @@ if [ -z "$FRONTEND_URL" ]; then
     FRONTEND_URL="localhost:8080"
 fi
 
-# Run load test
-for i in {1..1000}; do
-    curl -s "http://${FRONTEND_URL}/api/stats" > /dev/null &
-    if [ $((i % 100)) -eq 0 ]; then
-        echo "Sent $i requests..."
-    fi
-done
+# Run load test through the frontend's /api proxy to the processor.
+# Arguments are passed to the load test, e.g. --rate 500 --duration 120
+python3 "$(dirname "$0")/../benchmarks/load_test.py" \
+    --url "http://${FRONTEND_URL}/api" \
+    --scenarios ingest,batch,search,trace \
+    --duration 60 \
+    "$@"
 
-wait
 echo "Load test complete!"
 
-if [ ! -z "$PORTFORWARD_PID" ]; then
+if [ ! -z "${PORTFORWARD_PID:-}" ]; then
     kill $PORTFORWARD_PID
 fi
@@ -0,0 +1,279 @@
+"""Columnar cold tier: Parquet segments of logs older than COLD_AFTER.
+
+Segments live under ``{root}/day=YYYY-MM-DD/part-{max_id}.parquet``, one UTC
+day per directory. Rows are sorted by (service, level, timestamp) and written
+in row groups of ``row_group_rows``, so the min/max statistics of each row
+group are tight on the columns /logs/search filters by. A search reads only
+the footers of the days in its range (cached per segment). It skips row groups
+whose statistics can't match, and reads the rest through a memory map. Trace
+lookups can't be pruned that way and read the trace_id column of every segment.
+
+The exporter in main.py moves one day at a time. It first writes the day's
+rows to a new segment. On a later cycle, once every replica has had time to
+see the segment, it deletes those rows from the database. Until then, the rows
+are in both tiers, and searches drop the cold copy by id. A crash at any point
+leaves rows in at least one tier.
+"""
+import os
+import re
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("timestamp", pa.timestamp("us")),
+    ("level", pa.string()),
+    ("service", pa.string()),
+    ("message", pa.string()),
+    ("trace_id", pa.string()),
+    ("user_id", pa.string()),
+])
+PRUNE_COLUMNS = ("timestamp", "service", "level")
+DAY_DIR = re.compile(r"day=(\d{4}-\d{2}-\d{2})$")
+
+
+class Segment:
+    def __init__(self, path: str, day: date, metadata: pq.FileMetaData, mtime: float):
+        self.path = path
+        self.day = day
+        self.metadata = metadata
+        self.mtime = mtime
+        # Per row group: column -> (min, max)
+        self.stats: List[Dict[str, tuple]] = []
+        for index in range(metadata.num_row_groups):
+            row_group = metadata.row_group(index)
+            stats = {}
+            for column_index in range(row_group.num_columns):
+                column = row_group.column(column_index)
+                statistics = column.statistics
+                if column.path_in_schema in PRUNE_COLUMNS and statistics and statistics.has_min_max:
+                    stats[column.path_in_schema] = (statistics.min, statistics.max)
+            self.stats.append(stats)
+
+
+class SegmentWriter:
+    """Writes one segment to a temporary file, published on close"""
+
+    def __init__(self, tier: "ColdTier", day: date):
+        self.tier = tier
+        self.day = day
+        self.directory = tier.day_directory(day)
+        os.makedirs(self.directory, exist_ok=True)
+        self.tmp_path = os.path.join(self.directory, f".part-{os.getpid()}-{time.time_ns()}.tmp")
+        self.writer = pq.ParquetWriter(self.tmp_path, SCHEMA, compression="zstd")
+        self.rows = 0
+        self.max_id = 0
+
+    def write(self, rows: List[dict]):
+        if not rows:
+            return
+        self.writer.write_table(
+            pa.Table.from_pylist(rows, schema=SCHEMA), row_group_size=self.tier.row_group_rows
+        )
+        self.rows += len(rows)
+        self.max_id = max(self.max_id, max(row["id"] for row in rows))
+
+    def close(self) -> Optional[str]:
+        """Publish the segment and return its path, or None if it had no rows"""
+        self.writer.close()
+        if not self.rows:
+            os.unlink(self.tmp_path)
+            return None
+        with open(self.tmp_path, "rb") as f:
+            os.fsync(f.fileno())
+        path = os.path.join(self.directory, f"part-{self.max_id}.parquet")
+        os.replace(self.tmp_path, path)
+        self.tier.add(path, self.day)
+        return path
+
+    def abort(self):
+        self.writer.close()
+        os.unlink(self.tmp_path)
+
+
+class ColdTier:
+    def __init__(self, root: str, row_group_rows: int):
+        self.root = root
+        self.row_group_rows = row_group_rows
+        self.segments: Dict[str, Segment] = {}
+        # Searches read self.segments without locking; updates swap in a new dict
+        self._lock = threading.Lock()
+        # Called with (row groups read, row groups pruned) for each day scanned
+        self.on_scan: Optional[Callable[[int, int], None]] = None
+
+    def day_directory(self, day: date) -> str:
+        return os.path.join(self.root, f"day={day.isoformat()}")
+
+    def refresh(self):
+        """Pick up segments written by other replicas and forget deleted ones"""
+        found = {}
+        if os.path.isdir(self.root):
+            for day_entry in os.scandir(self.root):
+                match = DAY_DIR.match(day_entry.name)
+                if not match or not day_entry.is_dir():
+                    continue
+                for entry in os.scandir(day_entry.path):
+                    if entry.name.startswith("part-") and entry.name.endswith(".parquet"):
+                        found[entry.path] = (date.fromisoformat(match.group(1)), entry.stat().st_mtime)
+        with self._lock:
+            segments = {path: segment for path, segment in self.segments.items() if path in found}
+            for path, (day, mtime) in found.items():
+                if path not in segments:
+                    segments[path] = Segment(path, day, pq.read_metadata(path, memory_map=True), mtime)
+            self.segments = segments
+
+    def add(self, path: str, day: date):
+        segment = Segment(path, day, pq.read_metadata(path, memory_map=True), os.stat(path).st_mtime)
+        with self._lock:
+            self.segments = {**self.segments, path: segment}
+
+    def open_writer(self, day: date) -> SegmentWriter:
+        return SegmentWriter(self, day)
+
+    def newest_day_end(self) -> Optional[datetime]:
+        """End of the newest day with a segment; older rows may be in the cold tier"""
+        days = [segment.day for segment in self.segments.values()]
+        if not days:
+            return None
+        return datetime.combine(max(days), datetime.min.time()) + timedelta(days=1)
+
+    def day_ids(self, day: date, published_before: Optional[float] = None) -> Set[int]:
+        """Ids stored in the day's segments, optionally only those published before a time"""
+        ids = set()
+        for segment in list(self.segments.values()):
+            if segment.day == day and (published_before is None or segment.mtime < published_before):
+                table = pq.read_table(segment.path, columns=["id"], memory_map=True)
+                ids.update(table.column("id").to_pylist())
+        return ids
+
+    def _row_group_matches(self, stats: Dict[str, tuple], start, end, level, service, after) -> bool:
+        timestamp = stats.get("timestamp")
+        if timestamp:
+            if start and timestamp[1] < start:
+                return False
+            if end and timestamp[0] > end:
+                return False
+            if after and timestamp[0] > after[0]:
+                return False
+        for column, value in (("level", level), ("service", service)):
+            bounds = stats.get(column)
+            if value and bounds and not bounds[0] <= value <= bounds[1]:
+                return False
+        return True
+
+    def _scan_day(self, segments: List[Segment], start, end, level, service, terms, after) -> List[dict]:
+        tables = []
+        scanned = pruned = 0
+        for segment in segments:
+            row_groups = []
+            for index, stats in enumerate(segment.stats):
+                if self._row_group_matches(stats, start, end, level, service, after):
+                    row_groups.append(index)
+            scanned += len(row_groups)
+            pruned += len(segment.stats) - len(row_groups)
+            if not row_groups:
+                continue
+            parquet = pq.ParquetFile(segment.path, memory_map=True, metadata=segment.metadata)
+            tables.append(parquet.read_row_groups(row_groups, use_threads=False))
+        if self.on_scan:
+            self.on_scan(scanned, pruned)
+        if not tables:
+            return []
+
+        table = pa.concat_tables(tables)
+        conditions = []
+        if start:
+            conditions.append(pc.greater_equal(table["timestamp"], pa.scalar(start, pa.timestamp("us"))))
+        if end:
+            conditions.append(pc.less_equal(table["timestamp"], pa.scalar(end, pa.timestamp("us"))))
+        if level:
+            conditions.append(pc.equal(table["level"], level))
+        if service:
+            conditions.append(pc.equal(table["service"], service))
+        for term in terms:
+            conditions.append(pc.match_substring(table["message"], term, ignore_case=True))
+        if after:
+            after_timestamp = pa.scalar(after[0], pa.timestamp("us"))
+            conditions.append(pc.or_(
+                pc.less(table["timestamp"], after_timestamp),
+                pc.and_(pc.equal(table["timestamp"], after_timestamp), pc.less(table["id"], after[1]))
+            ))
+        if conditions:
+            mask = conditions[0]
+            for condition in conditions[1:]:
+                mask = pc.and_(mask, condition)
+            table = table.filter(mask)
+
+        table = table.sort_by([("timestamp", "descending"), ("id", "descending")])
+        rows = table.to_pylist()
+        for row in rows:
+            row["timestamp"] = row["timestamp"].isoformat()
+        return rows
+
+    def iter_days(
+        self,
+        start: Optional[datetime],
+        end: Optional[datetime],
+        level: Optional[str],
+        service: Optional[str],
+        terms: List[str],
+        after: Optional[Tuple[datetime, int]] = None
+    ) -> Iterator[List[dict]]:
+        """Yield the matching rows of each day, newest day first, each day newest row first"""
+        by_day: Dict[date, List[Segment]] = {}
+        for segment in list(self.segments.values()):
+            by_day.setdefault(segment.day, []).append(segment)
+        bounds = [value for value in (end, after[0] if after else None) if value]
+        upper = min(bounds) if bounds else None
+        for day in sorted(by_day, reverse=True):
+            if upper and day > upper.date():
+                continue
+            if start and day < start.date():
+                break
+            rows = self._scan_day(by_day[day], start, end, level, service, terms, after)
+            if rows:
+                yield rows
+
+    def traces(self, trace_ids: List[str]) -> Dict[str, List[dict]]:
+        """Rows of the given traces, by trace id.
+
+        Rows are sorted by service, so statistics can't rule out a trace id:
+        this reads the trace_id column of every row group, then whole rows of
+        the row groups holding a match.
+        """
+        wanted = pa.array(trace_ids, pa.string())
+        found: Dict[str, List[dict]] = {}
+        scanned = pruned = 0
+        for segment in list(self.segments.values()):
+            parquet = pq.ParquetFile(segment.path, memory_map=True, metadata=segment.metadata)
+            row_groups = []
+            for index in range(segment.metadata.num_row_groups):
+                column = parquet.read_row_group(index, columns=["trace_id"], use_threads=False)["trace_id"]
+                if pc.any(pc.is_in(column, value_set=wanted)).as_py():
+                    row_groups.append(index)
+            scanned += len(row_groups)
+            pruned += segment.metadata.num_row_groups - len(row_groups)
+            if not row_groups:
+                continue
+            table = parquet.read_row_groups(row_groups, use_threads=False)
+            for row in table.filter(pc.is_in(table["trace_id"], value_set=wanted)).to_pylist():
+                row["timestamp"] = row["timestamp"].isoformat()
+                found.setdefault(row["trace_id"], []).append(row)
+        if self.on_scan:
+            self.on_scan(scanned, pruned)
+        return found
+
+    def search(self, start, end, level, service, terms, after, limit: int) -> List[dict]:
+        """Up to limit matching rows, newest first"""
+        results = []
+        for rows in self.iter_days(start, end, level, service, terms, after):
+            results.extend(rows)
+            if len(results) >= limit:
+                break
+        return results[:limit]
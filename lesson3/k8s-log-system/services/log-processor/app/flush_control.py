@@ -0,0 +1,145 @@
+"""Adaptive flush policy for the processor buffer.
+
+A flush is due as soon as any one of three limits is reached:
+
+* age: the oldest buffered log has waited ``max_age`` seconds, so at low
+  traffic logs still reach the database (and searches) within that time;
+* bytes: the buffer holds ``max_bytes`` of log data;
+* size: the buffer holds ``batch_size`` logs.
+
+``batch_size`` follows the database. Each successful write is passed to
+``observe``, which fits commit latency as ``fixed + per_log * n`` by
+exponentially weighted least squares. The new batch size is the largest one
+predicted to commit within ``target_latency``. If that is too small for
+``slots`` concurrent flushes to keep up with ``target_throughput`` logs/s, it
+is raised to the smallest size that can. The result is clamped to
+[min_batch, max_batch] and changes by at most 2x per flush.
+"""
+import asyncio
+import time
+from typing import Optional
+
+
+class FlushController:
+    def __init__(
+        self,
+        batch_size: int,
+        min_batch: int,
+        max_batch: int,
+        max_age: float,
+        max_bytes: int,
+        target_latency: float,
+        target_throughput: float = 0.0,
+        slots: int = 1,
+        decay: float = 0.9
+    ):
+        self.min_batch = min_batch
+        self.max_batch = max(max_batch, min_batch)
+        self.batch_size = min(max(batch_size, self.min_batch), self.max_batch)
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.target_latency = target_latency
+        self.target_throughput = target_throughput
+        self.slots = slots
+        self.decay = decay
+        # Latency model, refitted on every observe()
+        self.fixed_seconds = 0.0
+        self.per_log_seconds = 0.0
+        # Decayed sums of weight, n, latency, n^2 and n*latency
+        self._sums = [0.0] * 5
+        # Accounting for the active buffer; callers update it under buffer_lock
+        self.buffered_bytes = 0
+        self.oldest: Optional[float] = None
+        self._pending = asyncio.Event()
+
+    def append(self, nbytes: int):
+        """Account for logs appended to the buffer"""
+        if nbytes <= 0:
+            # Nothing was appended, so no log is waiting
+            return
+        if self.oldest is None:
+            self.oldest = time.monotonic()
+            self._pending.set()
+        self.buffered_bytes += nbytes
+
+    def discard(self, nbytes: int):
+        """Account for logs taken back out of the buffer"""
+        self.buffered_bytes = max(0, self.buffered_bytes - nbytes)
+
+    def take(self) -> int:
+        """Reset for a freshly swapped-in empty buffer; return the bytes swapped out"""
+        nbytes = self.buffered_bytes
+        self.buffered_bytes = 0
+        self.oldest = None
+        self._pending.clear()
+        return nbytes
+
+    def restore(self, nbytes: int):
+        """Put back a failed batch. Its age restarts, so a failing database is
+        retried once per max_age instead of in a loop."""
+        self.append(nbytes)
+
+    def age(self) -> float:
+        """Seconds the oldest buffered log has waited"""
+        return time.monotonic() - self.oldest if self.oldest is not None else 0.0
+
+    def reason(self, size: int) -> Optional[str]:
+        """The limit a buffer of `size` logs has reached, or None if no flush is due"""
+        if not size:
+            return None
+        if size >= self.batch_size:
+            return "size"
+        if self.buffered_bytes >= self.max_bytes:
+            return "bytes"
+        if self.age() >= self.max_age:
+            return "age"
+        return None
+
+    async def wait_aged(self):
+        """Return once the oldest buffered log is max_age old"""
+        while True:
+            if self.oldest is None:
+                await self._pending.wait()
+                continue
+            delay = self.oldest + self.max_age - time.monotonic()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    def predicted_latency(self, size: int) -> float:
+        return self.fixed_seconds + self.per_log_seconds * size
+
+    def observe(self, size: int, seconds: float) -> int:
+        """Feed one committed batch into the model and return the new batch size"""
+        if size <= 0:
+            return self.batch_size
+        sums = self._sums
+        for index, value in enumerate((1.0, size, seconds, size * size, size * seconds)):
+            sums[index] = sums[index] * self.decay + value
+        weight, sum_n, sum_latency, sum_nn, sum_nl = sums
+        mean_n = sum_n / weight
+        mean_latency = sum_latency / weight
+        variance = sum_nn / weight - mean_n * mean_n
+        slope = (sum_nl / weight - mean_n * mean_latency) / variance if variance > (0.1 * mean_n) ** 2 else 0.0
+        if slope > 0:
+            self.per_log_seconds = slope
+            self.fixed_seconds = max(0.0, mean_latency - slope * mean_n)
+        else:
+            # Batch sizes too similar (or too noisy) to separate the fixed cost;
+            # charging everything per log overestimates larger batches, which is the safe side
+            self.per_log_seconds = mean_latency / mean_n
+            self.fixed_seconds = 0.0
+
+        if self.fixed_seconds >= self.target_latency:
+            target = self.min_batch
+        else:
+            target = (self.target_latency - self.fixed_seconds) / self.per_log_seconds
+        if self.target_throughput:
+            # slots * n / (fixed + per_log * n) >= throughput
+            headroom = self.slots - self.target_throughput * self.per_log_seconds
+            needed = self.target_throughput * self.fixed_seconds / headroom if headroom > 0 else self.max_batch
+            target = max(target, needed)
+
+        target = min(max(target, self.batch_size / 2), self.batch_size * 2)
+        self.batch_size = int(min(max(target, self.min_batch), self.max_batch))
+        return self.batch_size
@@ -0,0 +1,133 @@
+"""Kafka ingestion for the processor (at-least-once).
+
+Processor replicas share one consumer group, so the topic's partitions are
+consumed in parallel across pods. Each poll fetches a batch from every
+partition assigned to this pod. Auto-commit is off. The consumer records the
+next offset of every partition it has put into ``log_buffer``.
+``flush_buffer`` seals a snapshot of those offsets together with the batch it
+swaps out, and commits the snapshot once the batch is in the database.
+
+Flushes can finish out of order, so a snapshot is only committed after every
+earlier snapshot is done. A failed batch goes back to the buffer, and its
+snapshot waits for the next seal, which covers those records again. If the
+pod crashes, or loses partitions in a rebalance, the uncommitted records are
+delivered again. The database may then get duplicates, but never loses a log.
+"""
+import logging
+from typing import Dict, List, Optional
+
+from aiokafka import AIOKafkaConsumer, TopicPartition
+from aiokafka.abc import ConsumerRebalanceListener
+from aiokafka.errors import KafkaError
+
+logger = logging.getLogger(__name__)
+
+
+class OffsetSnapshot:
+    """Offsets covered by one flushed batch"""
+
+    def __init__(self, offsets: Dict[TopicPartition, int]):
+        self.offsets = offsets
+        self.done = False
+        # Released snapshots whose records were requeued into this batch
+        self.covers: List["OffsetSnapshot"] = []
+
+
+class KafkaIngest(ConsumerRebalanceListener):
+    def __init__(
+        self,
+        bootstrap_servers: str,
+        topics: List[str],
+        group_id: str,
+        max_poll_records: int,
+        poll_timeout_ms: int
+    ):
+        self.topics = topics
+        self.max_poll_records = max_poll_records
+        self.poll_timeout_ms = poll_timeout_ms
+        self.consumer = AIOKafkaConsumer(
+            bootstrap_servers=bootstrap_servers,
+            group_id=group_id,
+            enable_auto_commit=False,
+            auto_offset_reset="earliest",
+            max_poll_records=max_poll_records
+        )
+
+        # Next offset per partition of records already appended to the buffer
+        self._consumed: Dict[TopicPartition, int] = {}
+        # Sealed snapshots in seal order, not yet committed to Kafka
+        self._outstanding: List[OffsetSnapshot] = []
+        self._released: List[OffsetSnapshot] = []
+
+    async def start(self):
+        self.consumer.subscribe(self.topics, listener=self)
+        await self.consumer.start()
+
+    async def stop(self):
+        await self.consumer.stop()
+
+    async def fetch(self) -> Dict[TopicPartition, list]:
+        """Poll one batch per assigned partition"""
+        return await self.consumer.getmany(
+            timeout_ms=self.poll_timeout_ms, max_records=self.max_poll_records
+        )
+
+    def advance(self, batches: Dict[TopicPartition, list]):
+        """Record that the fetched records are in the buffer. Call under buffer_lock."""
+        for partition, records in batches.items():
+            if records:
+                self._consumed[partition] = records[-1].offset + 1
+
+    def seal(self) -> Optional[OffsetSnapshot]:
+        """Snapshot the offsets of everything in the buffer being swapped out. Call under buffer_lock."""
+        if not self._consumed and not self._released:
+            return None
+        snapshot = OffsetSnapshot(dict(self._consumed))
+        snapshot.covers, self._released = self._released, []
+        self._outstanding.append(snapshot)
+        return snapshot
+
+    def release(self, snapshot: Optional[OffsetSnapshot]):
+        """The batch failed and was requeued; the next seal takes over its records"""
+        if snapshot:
+            self._released.append(snapshot)
+
+    async def commit(self, snapshot: Optional[OffsetSnapshot]):
+        """Commit offsets up to the newest snapshot with no unfinished predecessor"""
+        if not snapshot:
+            return
+        snapshot.done = True
+        for covered in snapshot.covers:
+            covered.done = True
+
+        committable = None
+        while self._outstanding and self._outstanding[0].done:
+            committable = self._outstanding.pop(0)
+        if not committable or not committable.offsets:
+            return
+
+        try:
+            await self.consumer.commit(committable.offsets)
+        except KafkaError as e:
+            # Records are redelivered to whoever owns the partition next
+            logger.warning(f"Kafka offset commit failed: {e}")
+
+    def partition_lag(self) -> Dict[TopicPartition, int]:
+        """Records between this pod's position and the end of each assigned partition"""
+        lag = {}
+        for partition in self.consumer.assignment():
+            highwater = self.consumer.highwater(partition)
+            if highwater is not None and partition in self._consumed:
+                lag[partition] = max(0, highwater - self._consumed[partition])
+        return lag
+
+    async def on_partitions_revoked(self, revoked):
+        # Another pod resumes from the last committed offset; drop offsets we no
+        # longer own so later commits only cover assigned partitions
+        for partition in revoked:
+            self._consumed.pop(partition, None)
+            for snapshot in self._outstanding + self._released:
+                snapshot.offsets.pop(partition, None)
+
+    async def on_partitions_assigned(self, assigned):
+        logger.info(f"Assigned Kafka partitions: {sorted((p.topic, p.partition) for p in assigned)}")
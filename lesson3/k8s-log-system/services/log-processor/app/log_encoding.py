@@ -0,0 +1,214 @@
+"""Template-encoded log storage (LOG_ENCODING=template).
+
+Most messages come from a few templates in which only ids and numbers vary.
+``TemplateMiner`` finds those templates online with Drain: messages are
+grouped by token count and their leading tokens in a fixed-depth prefix tree.
+Each message joins the most similar template in its leaf and turns the
+positions where they differ into ``<*>`` wildcards.
+
+A template never changes once stored. When a cluster gains a wildcard, it is
+stored as a new template and earlier rows keep the old one. Parameters are
+stored as one string joined by PARAM_SEPARATOR; a text array would cost more
+in header bytes than the template saves. A message is rebuilt exactly by
+splitting its template on single spaces and filling each ``<*>`` with the
+next parameter. schema.py defines ``render_log_message`` in Postgres to do
+the same, so searches return plain messages.
+
+``LogEncoder`` turns buffered logs into rows that hold ids from the
+``log_templates``, ``log_services`` and ``log_levels`` dictionary tables.
+Replicas share those tables: a new name is inserted with ON CONFLICT DO
+NOTHING and read back, so every replica gets the same id for it.
+"""
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+
+WILDCARD = "<*>"
+# ASCII unit separator; messages containing it are stored as plain text
+PARAM_SEPARATOR = "\x1f"
+
+# Column order of encoded rows for the bulk writer (id is assigned by the database)
+ENCODED_LOG_COLUMNS = (
+    "timestamp", "level_id", "service_id", "template_id", "params", "message", "trace_id", "user_id"
+)
+
+
+_has_digit = re.compile(r"\d").search
+
+
+def is_variable(token: str) -> bool:
+    """Tokens holding digits (ids, counts, durations) are parameters from the start"""
+    return token == WILDCARD or _has_digit(token) is not None
+
+
+class Cluster:
+    __slots__ = ("tokens", "template")
+
+    def __init__(self, tokens: List[str]):
+        self.tokens = tokens
+        self.template = " ".join(tokens)
+
+
+class TemplateMiner:
+    def __init__(
+        self,
+        depth: int = 4,
+        similarity: float = 0.5,
+        max_children: int = 100,
+        max_clusters: int = 10000,
+        max_tokens: int = 64
+    ):
+        self.depth = depth
+        self.similarity = similarity
+        self.max_children = max_children
+        self.max_clusters = max_clusters
+        self.max_tokens = max_tokens
+        # token count -> prefix tree of the first depth - 2 tokens -> clusters
+        self.root: Dict[int, dict] = {}
+        self.clusters = 0
+        # Recently mined messages; a (template, params) pair stays a valid
+        # encoding after its cluster changes, because stored templates don't
+        self._recent: Dict[str, Tuple[str, List[str]]] = {}
+        self.max_recent = 4096
+
+    def _leaf(self, tokens: List[str]) -> list:
+        node = self.root.setdefault(len(tokens), {})
+        for token in tokens[:self.depth - 2]:
+            key = WILDCARD if is_variable(token) else token
+            if key not in node and len(node) >= self.max_children:
+                key = WILDCARD
+            node = node.setdefault(key, {})
+        return node.setdefault(None, [])
+
+    @staticmethod
+    def _score(cluster_tokens: List[str], tokens: List[str]) -> Tuple[float, int]:
+        same = wildcards = 0
+        for template_token, token in zip(cluster_tokens, tokens):
+            if template_token == WILDCARD:
+                wildcards += 1
+            elif template_token == token:
+                same += 1
+        # Wildcards count as similar, or messages that are mostly ids never match
+        return (same + wildcards) / len(tokens), wildcards
+
+    def add(self, message: str) -> Optional[Tuple[str, List[str]]]:
+        """Match or start a cluster; return (template, params), or None to store message as is"""
+        recent = self._recent.get(message)
+        if recent:
+            return recent
+        if PARAM_SEPARATOR in message:
+            return None
+        tokens = message.split(" ")
+        if len(tokens) > self.max_tokens:
+            return None
+        leaf = self._leaf(tokens)
+        best, best_score = None, (-1.0, -1)
+        for cluster in leaf:
+            score = self._score(cluster.tokens, tokens)
+            if score > best_score:
+                best, best_score = cluster, score
+
+        if best is not None and best_score[0] >= self.similarity:
+            merged = [
+                template_token if template_token == token and template_token != WILDCARD else WILDCARD
+                for template_token, token in zip(best.tokens, tokens)
+            ]
+            if merged != best.tokens:
+                best.tokens = merged
+                best.template = " ".join(merged)
+        elif self.clusters < self.max_clusters:
+            best = Cluster([WILDCARD if is_variable(token) else token for token in tokens])
+            leaf.append(best)
+            self.clusters += 1
+        else:
+            return None
+
+        params = [token for template_token, token in zip(best.tokens, tokens) if template_token == WILDCARD]
+        if len(self._recent) >= self.max_recent:
+            self._recent.clear()
+        self._recent[message] = result = (best.template, params)
+        return result
+
+
+def render(template: str, params: Sequence[str]) -> str:
+    """Rebuild a message; the Python twin of render_log_message in schema.py"""
+    values = iter(params)
+    return " ".join(next(values) if token == WILDCARD else token for token in template.split(" "))
+
+
+class LogEncoder:
+    # Dictionary table -> column holding the value
+    DICTIONARIES = {"log_services": "name", "log_levels": "name", "log_templates": "template"}
+
+    def __init__(self, engine, miner: TemplateMiner, max_template_chars: int = 1024):
+        self.engine = engine
+        self.miner = miner
+        self.max_template_chars = max_template_chars
+        # Only ids of committed dictionary rows are cached
+        self.ids: Dict[str, Dict[str, int]] = {table: {} for table in self.DICTIONARIES}
+        self.encoded = 0
+        self.plain = 0
+
+    async def _resolve(self, wanted: Dict[str, set]):
+        """Fetch or assign ids for values not cached yet, in one transaction"""
+        missing = {
+            table: sorted(values - self.ids[table].keys()) for table, values in wanted.items()
+        }
+        if not any(missing.values()):
+            return
+        resolved = {}
+        async with self.engine.begin() as conn:
+            for table, values in missing.items():
+                if not values:
+                    continue
+                column = self.DICTIONARIES[table]
+                params = {"values": values}
+                await conn.execute(text(
+                    f"INSERT INTO {table} ({column}) SELECT unnest(CAST(:values AS TEXT[])) "
+                    f"ON CONFLICT ({column}) DO NOTHING"
+                ), params)
+                rows = await conn.execute(text(
+                    f"SELECT {column}, id FROM {table} WHERE {column} = ANY(CAST(:values AS TEXT[]))"
+                ), params)
+                resolved[table] = dict(rows.all())
+        for table, ids in resolved.items():
+            self.ids[table].update(ids)
+
+    async def encode(self, logs: List[dict], to_timestamp) -> List[tuple]:
+        """Rows in ENCODED_LOG_COLUMNS order; messages that fit no template stay plain text"""
+        mined = []
+        for log_data in logs:
+            result = self.miner.add(log_data["message"])
+            if result and len(result[0]) > self.max_template_chars:
+                result = None
+            mined.append(result)
+
+        await self._resolve({
+            "log_services": {log_data["service"] for log_data in logs},
+            "log_levels": {log_data["level"] for log_data in logs},
+            "log_templates": {result[0] for result in mined if result},
+        })
+        services, levels, templates = (
+            self.ids["log_services"], self.ids["log_levels"], self.ids["log_templates"]
+        )
+        records = []
+        for log_data, result in zip(logs, mined):
+            if result:
+                template_id, message = templates[result[0]], None
+                params = PARAM_SEPARATOR.join(result[1]) if result[1] else None
+                self.encoded += 1
+            else:
+                template_id, params, message = None, None, log_data["message"]
+                self.plain += 1
+            records.append((
+                to_timestamp(log_data["timestamp"]),
+                levels[log_data["level"]],
+                services[log_data["service"]],
+                template_id,
+                params,
+                message,
+                log_data.get("trace_id"),
+                log_data.get("user_id"),
+            ))
+        return records
@@ -0,0 +1,188 @@
+"""TimescaleDB schema management for the logs table.
+
+Turns ``logs`` into a hypertable partitioned on ``timestamp`` and applies
+compression and retention policies. Every step is idempotent, so it runs on
+each startup and also migrates tables created by earlier versions of the
+processor (plain table, ``id``-only primary key, one B-tree per column).
+Replicas serialize on an advisory lock so only one runs the migration.
+
+With LOG_ENCODING=template (see log_encoding.py) the table stores
+``service_id``/``level_id`` instead of ``service``/``level``. Indexes,
+compression and aggregates use those columns instead.
+"""
+import logging
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_LOCK_ID = 72_010_001
+
+# Single-column indexes created by the original LogModel. The hypertable brings
+# its own timestamp index, and the composite indexes cover the search filters.
+LEGACY_INDEXES = (
+    "ix_logs_timestamp", "ix_logs_level", "ix_logs_service", "ix_logs_user_id", "ix_logs_trace_id"
+)
+
+# Continuous aggregates of log counts: view -> (bucket, refresh start offset, schedule).
+# Real-time aggregation is on, so rows newer than the last refresh are read from logs.
+CONTINUOUS_AGGREGATES = {
+    "logs_counts_1m": ("1 minute", "1 hour", "1 minute"),
+    "logs_counts_1h": ("1 hour", "1 day", "30 minutes"),
+}
+
+COMPOSITE_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS ix_logs_{service}_{level}_timestamp "
+    "ON logs ({service}, {level}, timestamp DESC)",
+    "CREATE INDEX IF NOT EXISTS ix_logs_{level}_timestamp ON logs ({level}, timestamp DESC)",
+    "CREATE INDEX IF NOT EXISTS ix_logs_trace_id_timestamp ON logs (trace_id, timestamp)",
+)
+
+# Rebuilds a template-encoded message; the SQL twin of log_encoding.render
+RENDER_FUNCTION = """
+CREATE OR REPLACE FUNCTION render_log_message(template TEXT, params TEXT) RETURNS TEXT AS $$
+DECLARE
+    tokens TEXT[] := string_to_array(template, ' ');
+    -- Trailing separator, so a single empty parameter still splits into one element
+    values TEXT[] := string_to_array(params || chr(31), chr(31));
+    slot INT := 0;
+BEGIN
+    FOR i IN 1 .. coalesce(array_length(tokens, 1), 0) LOOP
+        IF tokens[i] = '<*>' THEN
+            slot := slot + 1;
+            tokens[i] := values[slot];
+        END IF;
+    END LOOP;
+    RETURN array_to_string(tokens, ' ');
+END
+$$ LANGUAGE plpgsql IMMUTABLE PARALLEL SAFE
+"""
+
+
+def dimension_columns(encoded: bool) -> tuple:
+    """(service column, level column) of the logs table"""
+    return ("service_id", "level_id") if encoded else ("service", "level")
+
+
+async def check_log_encoding(conn, encoded: bool):
+    """Refuse to start when an existing logs table was created with the other LOG_ENCODING"""
+    columns = set(await conn.scalars(text(
+        "SELECT column_name FROM information_schema.columns WHERE table_name = 'logs'"
+    )))
+    if columns and ("template_id" in columns) != encoded:
+        raise RuntimeError(
+            f"logs table was created with LOG_ENCODING={'template' if 'template_id' in columns else 'plain'}; "
+            "migrate it or point this processor at a new database"
+        )
+
+
+async def ensure_render_function(conn):
+    await conn.execute(text(RENDER_FUNCTION))
+
+
+async def ensure_search_indexes(conn):
+    """Trigram GIN index backing substring/phrase search on message"""
+    available = await conn.scalar(text(
+        "SELECT count(*) FROM pg_available_extensions WHERE name = 'pg_trgm'"
+    ))
+    if not available:
+        logger.warning("pg_trgm extension not available, message search will scan")
+        return
+    await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    await conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_logs_message_trgm ON logs USING gin (message gin_trgm_ops)"
+    ))
+
+
+async def ensure_timescale_schema(
+    conn, chunk_interval: str, compress_after: str, retention_period: str, encoded: bool = False
+) -> bool:
+    """Convert logs to a hypertable and apply policies. Intervals are Postgres interval strings.
+
+    Returns False when TimescaleDB is not available and logs stays a plain table.
+    """
+    await conn.execute(text("SELECT pg_advisory_xact_lock(:lock_id)"), {"lock_id": SCHEMA_LOCK_ID})
+
+    available = await conn.scalar(text(
+        "SELECT count(*) FROM pg_available_extensions WHERE name = 'timescaledb'"
+    ))
+    if not available:
+        logger.warning("TimescaleDB extension not available, keeping logs as a plain table")
+        return False
+    await conn.execute(text("CREATE EXTENSION IF NOT EXISTS timescaledb"))
+    service, level = dimension_columns(encoded)
+
+    # Unique indexes on a hypertable must include the partitioning column
+    primary_key = await conn.scalar(text(
+        "SELECT array_agg(a.attname::text ORDER BY a.attname) "
+        "FROM pg_index i JOIN pg_attribute a "
+        "ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey) "
+        "WHERE i.indrelid = 'logs'::regclass AND i.indisprimary"
+    ))
+    if primary_key != ["id", "timestamp"]:
+        logger.info("Migrating logs primary key to (id, timestamp)")
+        await conn.execute(text(
+            "ALTER TABLE logs DROP CONSTRAINT IF EXISTS logs_pkey, ADD PRIMARY KEY (id, timestamp)"
+        ))
+
+    for index in LEGACY_INDEXES:
+        await conn.execute(text(f"DROP INDEX IF EXISTS {index}"))
+    for statement in COMPOSITE_INDEXES:
+        await conn.execute(text(statement.format(service=service, level=level)))
+
+    is_hypertable = await conn.scalar(text(
+        "SELECT count(*) FROM timescaledb_information.hypertables WHERE hypertable_name = 'logs'"
+    ))
+    if not is_hypertable:
+        logger.info(f"Converting logs to a hypertable (chunk interval {chunk_interval})")
+        await conn.execute(
+            text(
+                "SELECT create_hypertable('logs', 'timestamp', "
+                "chunk_time_interval => CAST(:chunk_interval AS INTERVAL), migrate_data => true)"
+            ),
+            {"chunk_interval": chunk_interval}
+        )
+    else:
+        await conn.execute(
+            text("SELECT set_chunk_time_interval('logs', CAST(:chunk_interval AS INTERVAL))"),
+            {"chunk_interval": chunk_interval}
+        )
+
+    await conn.execute(text("SELECT remove_compression_policy('logs', if_exists => true)"))
+    if compress_after:
+        compressed = await conn.scalar(text(
+            "SELECT compression_enabled FROM timescaledb_information.hypertables "
+            "WHERE hypertable_name = 'logs'"
+        ))
+        if not compressed:
+            await conn.execute(text(
+                "ALTER TABLE logs SET (timescaledb.compress, "
+                f"timescaledb.compress_segmentby = '{service}', "
+                "timescaledb.compress_orderby = 'timestamp DESC, id DESC')"
+            ))
+        await conn.execute(
+            text("SELECT add_compression_policy('logs', CAST(:compress_after AS INTERVAL))"),
+            {"compress_after": compress_after}
+        )
+
+    await conn.execute(text("SELECT remove_retention_policy('logs', if_exists => true)"))
+    if retention_period:
+        await conn.execute(
+            text("SELECT add_retention_policy('logs', CAST(:retention_period AS INTERVAL))"),
+            {"retention_period": retention_period}
+        )
+
+    for view, (bucket, start_offset, schedule) in CONTINUOUS_AGGREGATES.items():
+        await conn.execute(text(
+            f"CREATE MATERIALIZED VIEW IF NOT EXISTS {view} "
+            "WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS "
+            f"SELECT time_bucket(INTERVAL '{bucket}', timestamp) AS bucket, {service}, {level}, "
+            "count(*) AS count FROM logs GROUP BY 1, 2, 3 WITH NO DATA"
+        ))
+        await conn.execute(text(
+            f"SELECT add_continuous_aggregate_policy('{view}', "
+            f"start_offset => INTERVAL '{start_offset}', end_offset => INTERVAL '{bucket}', "
+            f"schedule_interval => INTERVAL '{schedule}', if_not_exists => true)"
+        ))
+
+    return True
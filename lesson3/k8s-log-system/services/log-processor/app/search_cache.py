@@ -0,0 +1,176 @@
+"""Two-tier cache for /logs/search results.
+
+Tier 1 is a bounded in-process LRU with a short TTL; tier 2 is Redis, shared
+by all processor replicas. Concurrent misses for the same key share a single
+load (single-flight).
+
+Redis entries are versioned rather than deleted. A flush increments the
+global counter ``searchgen`` and stamps its value on every time bucket it
+wrote (``searchgen:{bucket}``). A query's Redis key ends with the highest
+stamp among the buckets its range covers, so only flushes that overlap its
+range change it. Queries that are open-ended or span more than
+``max_buckets`` buckets are "wide" and use ``searchgen`` itself, which every
+flush changes. The version is read before the database load, so a load that
+raced a flush on any replica is stored under the old version and never
+served again. Stamps only grow, since they all come from one counter, so an
+old version never comes back.
+
+What staleness remains: between a flush's commit and its version bump (one
+Redis round-trip), any replica may serve the previous results, and local
+tiers of other replicas are not told about a flush, so they stay stale for up
+to ``local_ttl``.
+"""
+import asyncio
+import json
+import math
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Awaitable, Callable, Iterable, List, Optional, Set, Tuple
+
+GENERATION_KEY = "searchgen"
+
+
+def bucket_generation_key(bucket: int) -> str:
+    return f"searchgen:{bucket}"
+
+
+class SearchCache:
+    def __init__(
+        self,
+        max_entries: int,
+        max_bytes: int,
+        local_ttl: float,
+        redis_ttl: int,
+        bucket_seconds: int,
+        max_buckets: int
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.local_ttl = local_ttl
+        self.redis_ttl = redis_ttl
+        self.bucket_seconds = bucket_seconds
+        self.max_buckets = max_buckets
+        self.redis = None
+
+        # key -> (expires_at, results, size, bucket range)
+        self._entries: OrderedDict = OrderedDict()
+        self._bytes = 0
+        self._inflight = {}
+        # Bumped on every invalidation so loads that raced a flush are not cached locally
+        self._generation = 0
+
+    def bucket_of(self, timestamp: datetime) -> int:
+        return int(timestamp.timestamp() // self.bucket_seconds)
+
+    def bucket_range(self, start: Optional[datetime], end: Optional[datetime]) -> Tuple[float, float]:
+        low = self.bucket_of(start) if start else -math.inf
+        high = self.bucket_of(end) if end else math.inf
+        return low, high
+
+    def _store_local(self, key: str, results: list, size: int, buckets: Tuple[float, float]):
+        if size > self.max_bytes:
+            return
+        self._evict(key)
+        self._entries[key] = (time.monotonic() + self.local_ttl, results, size, buckets)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._evict(oldest)
+
+    def _evict(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry:
+            self._bytes -= entry[2]
+
+    def _get_local(self, key: str) -> Optional[list]:
+        entry = self._entries.get(key)
+        if not entry:
+            return None
+        if entry[0] < time.monotonic():
+            self._evict(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def _is_wide(self, buckets: Tuple[float, float]) -> bool:
+        low, high = buckets
+        return math.isinf(low) or math.isinf(high) or high - low + 1 > self.max_buckets
+
+    async def _version(self, buckets: Tuple[float, float]) -> int:
+        """Highest flush stamp over the range; wide ranges use the global counter"""
+        if self._is_wide(buckets):
+            return int(await self.redis.get(GENERATION_KEY) or 0)
+        low, high = buckets
+        stamps = await self.redis.mget([bucket_generation_key(bucket) for bucket in range(int(low), int(high) + 1)])
+        return max(int(stamp or 0) for stamp in stamps)
+
+    async def get_or_load(
+        self,
+        key: str,
+        start: Optional[datetime],
+        end: Optional[datetime],
+        loader: Callable[[], Awaitable[List[dict]]]
+    ) -> Tuple[list, Optional[str]]:
+        """Return (results, source) where source is "local", "redis", "coalesced" or None for a DB load"""
+        results = self._get_local(key)
+        if results is not None:
+            return results, "local"
+
+        if key in self._inflight:
+            return await asyncio.shield(self._inflight[key]), "coalesced"
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        buckets = self.bucket_range(start, end)
+        generation = self._generation
+        try:
+            source = None
+            payload = None
+            if self.redis:
+                redis_key = f"{key}:v{await self._version(buckets)}"
+                payload = await self.redis.get(redis_key)
+            if payload:
+                results = json.loads(payload)
+                source = "redis"
+            else:
+                results = await loader()
+                payload = json.dumps(results)
+                if self.redis:
+                    await self.redis.setex(redis_key, self.redis_ttl, payload)
+
+            if generation == self._generation:
+                self._store_local(key, results, len(payload), buckets)
+            future.set_result(results)
+            return results, source
+
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so waiter-less failures do not log warnings
+            future.exception()
+            raise
+
+        finally:
+            self._inflight.pop(key, None)
+
+    async def invalidate(self, buckets: Iterable[int]):
+        """Drop local results and retire Redis versions whose range overlaps any written bucket"""
+        buckets: Set[int] = set(buckets)
+        if not buckets:
+            return
+        self._generation += 1
+
+        stale = [
+            key for key, (_, _, _, (low, high)) in self._entries.items()
+            if any(low <= bucket <= high for bucket in buckets)
+        ]
+        for key in stale:
+            self._evict(key)
+
+        if self.redis:
+            stamp = await self.redis.incr(GENERATION_KEY)
+            pipe = self.redis.pipeline(transaction=False)
+            for bucket in buckets:
+                # Outlives every entry that read the previous stamp
+                pipe.set(bucket_generation_key(bucket), stamp, ex=2 * self.redis_ttl)
+            await pipe.execute()
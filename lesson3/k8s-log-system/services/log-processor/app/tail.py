@@ -0,0 +1,108 @@
+"""Live tail subscriptions for /logs/tail.
+
+Subscribers are indexed by their (service, level) filter, with ``None`` as the
+wildcard. Each published log is matched by looking up the four keys it can
+satisfy (exact, any level, any service, everything), so the cost per log does
+not grow with the number of subscribers that don't want it.
+
+Each subscriber has a bounded queue. When a slow client lets its queue fill,
+the oldest line is dropped and counted, and the client is told how many it
+missed. Publishing never awaits, so tail clients can't slow ingestion down.
+"""
+import asyncio
+from collections import defaultdict, deque
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+FilterKey = Tuple[Optional[str], Optional[str]]
+
+
+class Subscriber:
+    def __init__(self, service: Optional[str], level: Optional[str], max_queue: int):
+        self.key: FilterKey = (service, level)
+        self.queue: deque = deque(maxlen=max_queue)
+        self.dropped = 0
+        self._ready = asyncio.Event()
+
+    def push(self, line: str) -> bool:
+        """Queue one line; return True if the oldest queued line was dropped for it"""
+        full = len(self.queue) == self.queue.maxlen
+        if full:
+            self.dropped += 1
+        self.queue.append(line)
+        self._ready.set()
+        return full
+
+    async def drain(self, timeout: float) -> Tuple[List[str], int]:
+        """Wait up to timeout for lines; return them with the count dropped since the last drain"""
+        if not self.queue:
+            # A timer instead of wait_for, which would create a task per wakeup
+            timer = asyncio.get_running_loop().call_later(timeout, self._ready.set)
+            try:
+                await self._ready.wait()
+            finally:
+                timer.cancel()
+        lines = list(self.queue)
+        self.queue.clear()
+        self._ready.clear()
+        dropped, self.dropped = self.dropped, 0
+        return lines, dropped
+
+
+class TailRegistry:
+    def __init__(self, max_queue: int, max_subscribers: int, serialize: Callable[[dict], str]):
+        self.max_queue = max_queue
+        self.max_subscribers = max_subscribers
+        self.serialize = serialize
+        self._subscribers: Dict[FilterKey, Set[Subscriber]] = defaultdict(set)
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def subscribe(self, service: Optional[str], level: Optional[str]) -> Optional[Subscriber]:
+        """Register a subscriber, or return None when max_subscribers are connected"""
+        if self._count >= self.max_subscribers:
+            return None
+        subscriber = Subscriber(service or None, level or None, self.max_queue)
+        self._subscribers[subscriber.key].add(subscriber)
+        self._count += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscribers = self._subscribers.get(subscriber.key)
+        if subscribers and subscriber in subscribers:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[subscriber.key]
+            self._count -= 1
+
+    def publish(
+        self,
+        records: List[dict],
+        encoded: Optional[Iterable[Union[bytes, str]]] = None
+    ) -> Tuple[int, int]:
+        """Fan records out to matching subscribers; return (lines delivered, lines dropped).
+
+        encoded holds each record's JSON from the fast path. Otherwise a record is
+        serialized only if some subscriber wants it.
+        """
+        if not self._count:
+            return 0, 0
+        index = self._subscribers
+        delivered = dropped = 0
+        for record, payload in zip(records, encoded or [None] * len(records)):
+            service, level = record["service"], record["level"]
+            line = None
+            for key in ((service, level), (service, None), (None, level), (None, None)):
+                subscribers = index.get(key)
+                if not subscribers:
+                    continue
+                if line is None:
+                    if payload is None:
+                        line = self.serialize(record)
+                    else:
+                        line = payload.decode() if isinstance(payload, bytes) else payload
+                for subscriber in subscribers:
+                    dropped += subscriber.push(line)
+                delivered += len(subscribers)
+        return delivered, dropped
@@ -0,0 +1,115 @@
+"""Redis cache of recent spans per trace for /logs/trace/{trace_id}.
+
+Each trace is a Redis list ``trace:{trace_id}``. Ingest appends every span with
+RPUSH and refreshes the TTL with EXPIRE in the same pipeline, so all replicas
+append to one list and no span overwrites another. Reads return the list
+sorted by timestamp, since spans from different producers arrive out of order.
+
+Misses are collected for ``batch_window`` seconds and loaded from the database
+with one query for up to ``max_batch`` traces. Each loaded trace is written to
+a temporary key and moved into place with RENAMENX, so a backfill never
+replaces a list that ingest recreated while the query ran.
+
+A trace whose spans are further apart than ``ttl`` is only partly cached once
+its list has expired and a new span recreates it; such lookups return the
+recent spans only until the list expires again.
+"""
+import asyncio
+import json
+import logging
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+def trace_key(trace_id: str) -> str:
+    return f"trace:{trace_id}"
+
+
+def sort_spans(spans: List[dict]) -> List[dict]:
+    # Timestamps are naive UTC ISO strings, which sort chronologically
+    return sorted(spans, key=lambda span: span["timestamp"])
+
+
+class TraceCache:
+    def __init__(self, ttl: int, batch_window: float, max_batch: int):
+        self.ttl = ttl
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.redis = None
+        self.loader: Optional[Callable[[List[str]], Awaitable[Dict[str, List[dict]]]]] = None
+
+        # trace_id -> future of spans, for misses waiting on or running a DB load
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._queued: List[str] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def append(self, pipe, spans: Iterable[Tuple[str, Union[str, bytes]]]):
+        """Queue RPUSH + EXPIRE for (trace_id, encoded span) pairs on an existing pipeline"""
+        by_trace = {}
+        for trace_id, payload in spans:
+            by_trace.setdefault(trace_id, []).append(payload)
+        for trace_id, payloads in by_trace.items():
+            key = trace_key(trace_id)
+            pipe.rpush(key, *payloads)
+            pipe.expire(key, self.ttl)
+
+    async def get(self, trace_id: str) -> Tuple[List[dict], str]:
+        """Return (spans, source) where source is "redis", "coalesced" or "database" """
+        if self.redis:
+            payloads = await self.redis.lrange(trace_key(trace_id), 0, -1)
+            if payloads:
+                return sort_spans([json.loads(payload) for payload in payloads]), "redis"
+
+        if trace_id in self._pending:
+            return await asyncio.shield(self._pending[trace_id]), "coalesced"
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[trace_id] = future
+        self._queued.append(trace_id)
+        if len(self._queued) >= self.max_batch:
+            self._load_queued()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.batch_window, self._load_queued)
+        return await asyncio.shield(future), "database"
+
+    def _load_queued(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        trace_ids, self._queued = self._queued, []
+        if trace_ids:
+            asyncio.create_task(self._load(trace_ids))
+
+    async def _load(self, trace_ids: List[str]):
+        try:
+            loaded = await self.loader(trace_ids)
+        except Exception as e:
+            for trace_id in trace_ids:
+                future = self._pending.pop(trace_id)
+                future.set_exception(e)
+                # Mark retrieved so waiter-less failures do not log warnings
+                future.exception()
+            return
+
+        if self.redis:
+            try:
+                await self._backfill(loaded)
+            except Exception as e:
+                logger.warning(f"Trace cache backfill failed: {e}")
+
+        for trace_id in trace_ids:
+            self._pending.pop(trace_id).set_result(sort_spans(loaded.get(trace_id, [])))
+
+    async def _backfill(self, loaded: Dict[str, List[dict]]):
+        pipe = self.redis.pipeline(transaction=True)
+        for trace_id, spans in loaded.items():
+            if not spans:
+                continue
+            key = trace_key(trace_id)
+            staging = f"{key}:backfill"
+            pipe.delete(staging)
+            pipe.rpush(staging, *(json.dumps(span) for span in spans))
+            pipe.renamenx(staging, key)
+            pipe.delete(staging)
+            pipe.expire(key, self.ttl)
+        await pipe.execute()
@@ -0,0 +1,225 @@
+"""Append-only, segment-rotated write-ahead log for the processor buffer.
+
+Every batch appended to ``log_buffer`` is also framed into an mmap-backed
+segment file on the StatefulSet PVC. A background task fsyncs the segments in
+groups, so many concurrent writers share one fsync. On ``flush_buffer`` the
+current segment is sealed and handed to the batch; once the batch is committed
+to the database its segments are deleted. Anything left on disk after a crash
+is replayed into the buffer on startup (at-least-once delivery).
+
+Frame layout: ``<length:u32><crc32:u32><payload>``, payload is a JSON array of
+log dicts. A zero length or a CRC mismatch marks the end of a segment.
+"""
+import asyncio
+import json
+import logging
+import mmap
+import os
+import struct
+import zlib
+from typing import List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+FRAME_HEADER = struct.Struct("<II")
+SEGMENT_PREFIX = "wal-"
+SEGMENT_SUFFIX = ".log"
+
+
+def segment_name(seq: int) -> str:
+    return f"{SEGMENT_PREFIX}{seq:016d}{SEGMENT_SUFFIX}"
+
+
+def read_segment(path: str) -> List[dict]:
+    """Decode all intact frames from a segment file"""
+    records = []
+    with open(path, "rb") as f:
+        data = f.read()
+
+    offset = 0
+    while offset + FRAME_HEADER.size <= len(data):
+        length, crc = FRAME_HEADER.unpack_from(data, offset)
+        if length == 0:
+            break
+        start = offset + FRAME_HEADER.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            logger.warning(f"Torn WAL frame in {path} at offset {offset}, ignoring tail")
+            break
+        records.extend(json.loads(payload))
+        offset = start + length
+
+    return records
+
+
+class Segment:
+    """A preallocated, memory-mapped segment file"""
+
+    def __init__(self, path: str, seq: int, size: int):
+        self.path = path
+        self.seq = seq
+        self.size = size
+        self.offset = 0
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            # Reserve the blocks now: a sparse file would turn a full disk into
+            # SIGBUS on a later write through the mapping instead of ENOSPC here
+            os.posix_fallocate(self.fd, 0, size)
+            self.mm = mmap.mmap(self.fd, size)
+        except OSError:
+            os.close(self.fd)
+            os.remove(path)
+            raise
+
+    def fits(self, length: int) -> bool:
+        return self.offset + length <= self.size
+
+    def write(self, frame: bytes):
+        end = self.offset + len(frame)
+        self.mm[self.offset:end] = frame
+        self.offset = end
+
+    def sync(self):
+        # fdatasync on the fd also persists dirty pages of the shared mapping,
+        # and unlike mmap.flush() it releases the GIL
+        os.fdatasync(self.fd)
+
+    def close(self):
+        self.mm.close()
+        os.ftruncate(self.fd, self.offset)
+        os.close(self.fd)
+
+
+class WriteAheadLog:
+    def __init__(self, directory: str, segment_bytes: int, sync_interval: float):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.sync_interval = sync_interval
+
+        self._segment = None
+        self._next_seq = 0
+        # Sealed segments still waiting for their final fsync and close
+        self._sealed: List[Segment] = []
+        # Sealed segment seqs whose records sit in the active buffer
+        self._pending: Set[int] = set()
+        self._written = 0
+        self._waiters: List[Tuple[int, asyncio.Future]] = []
+        self._dirty = asyncio.Event()
+        self._syncer = None
+
+        os.makedirs(directory, exist_ok=True)
+
+    def _segment_files(self) -> List[Tuple[int, str]]:
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                seq = int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+                segments.append((seq, os.path.join(self.directory, name)))
+        return sorted(segments)
+
+    def replay(self) -> List[dict]:
+        """Load records left over from a previous run. Call before start()."""
+        records = []
+        for seq, path in self._segment_files():
+            records.extend(read_segment(path))
+            self._pending.add(seq)
+            self._next_seq = seq + 1
+        return records
+
+    def start(self):
+        self._open_segment(self.segment_bytes)
+        self._syncer = asyncio.create_task(self._sync_loop())
+
+    def _open_segment(self, size: int):
+        path = os.path.join(self.directory, segment_name(self._next_seq))
+        self._segment = Segment(path, self._next_seq, size)
+        self._next_seq += 1
+
+    def _rotate(self, min_size: int = 0):
+        # Open the next segment first, so a full disk leaves the current one writable
+        segment = self._segment
+        self._open_segment(max(self.segment_bytes, min_size))
+        self._sealed.append(segment)
+        self._pending.add(segment.seq)
+
+    def write(self, records: List[dict], encoded: Optional[List[bytes]] = None) -> asyncio.Future:
+        """Append records; the returned future resolves once they are fsynced.
+
+        encoded, when given, holds each record's JSON and is framed as is.
+        """
+        if encoded:
+            payload = b"[" + b",".join(encoded) + b"]"
+        else:
+            payload = json.dumps(records, default=str, separators=(",", ":")).encode()
+        frame = FRAME_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+        if not self._segment.fits(len(frame)):
+            self._rotate(len(frame))
+        self._segment.write(frame)
+        self._written += len(frame)
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((self._written, future))
+        self._dirty.set()
+        return future
+
+    def seal(self) -> Set[int]:
+        """Seal the current segment and hand out every segment written since the last seal"""
+        if self._segment.offset:
+            self._rotate()
+        segments, self._pending = self._pending, set()
+        return segments
+
+    def release(self, segments: Set[int]):
+        """Return segments of a failed batch; they ride along with the next seal"""
+        self._pending |= segments
+
+    def commit(self, segments: Set[int]):
+        """Delete segments whose records are committed to the database"""
+        for seq in segments:
+            try:
+                os.remove(os.path.join(self.directory, segment_name(seq)))
+            except FileNotFoundError:
+                pass
+
+    async def _sync_loop(self):
+        while True:
+            await self._dirty.wait()
+            # Group commit window: let concurrent writers share one fsync
+            await asyncio.sleep(self.sync_interval)
+            await self._sync()
+
+    async def _sync(self):
+        self._dirty.clear()
+        target = self._written
+        sealed, self._sealed = self._sealed, []
+        segments = sealed + [self._segment]
+
+        error = None
+        try:
+            await asyncio.to_thread(lambda: [segment.sync() for segment in segments])
+            for segment in sealed:
+                segment.close()
+        except OSError as e:
+            logger.error(f"WAL fsync failed: {e}")
+            self._sealed[:0] = sealed
+            error = e
+
+        remaining = []
+        for lsn, future in self._waiters:
+            if lsn > target:
+                remaining.append((lsn, future))
+            elif not future.done():
+                if error:
+                    future.set_exception(error)
+                else:
+                    future.set_result(None)
+        self._waiters = remaining
+
+    async def close(self):
+        if self._syncer:
+            self._syncer.cancel()
+        await self._sync()
+        self._segment.close()
+        if not self._segment.offset:
+            os.remove(self._segment.path)
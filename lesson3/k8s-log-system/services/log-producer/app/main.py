@@ -1,16 +1,30 @@
 import asyncio
-import random
+import bisect
+import hashlib
+import hmac
 import json
+import math
+import multiprocessing
+import queue
+import random
+import socket
+import time
 from datetime import datetime
-from typing import Optional
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field
+from typing import Dict, List, Optional, Tuple
+from fastapi import FastAPI, Header, HTTPException, Query
+from pydantic import BaseModel
 import httpx
+from aiokafka import AIOKafkaProducer
+from aiokafka.errors import KafkaError
 import logging
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
-from fastapi.responses import Response
+from prometheus_client import Counter, Histogram, Gauge, REGISTRY, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client.core import Metric
+from fastapi.responses import PlainTextResponse, Response
+import numpy as np
 import os
 
+import profiler
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -21,29 +35,155 @@ app = FastAPI(title="Log Producer Service")
 logs_generated = Counter('logs_generated_total', 'Total logs generated')
 log_latency = Histogram('log_generation_latency_seconds', 'Log generation latency')
 send_errors = Counter('log_send_errors_total', 'Total errors sending logs')
+send_retries = Counter('log_send_retries_total', 'Total batch send retries')
+batch_size_observed = Histogram(
+    'log_send_batch_size', 'Logs per shipped batch',
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+)
+send_latency = Histogram('log_send_latency_seconds', 'Batch send latency including retries')
+# Measured from each log's scheduled send time, so stalls are not hidden
+# (coordinated-omission corrected)
+delivery_latency = Histogram(
+    'log_delivery_latency_seconds', 'Scheduled send time to processor acknowledgement',
+    buckets=(.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+)
+target_rate_gauge = Gauge('log_target_rate', 'Configured logs per second')
+achieved_rate_gauge = Gauge('log_achieved_rate', 'Acknowledged logs per second')
+processor_shards = Gauge('log_processor_shards', 'Processor replicas on the routing ring')
+# Pipeline stages per batch (send attempts per attempt)
+STAGES = ("queue_wait", "batch_fill", "route", "encode", "http_post", "response_decode", "kafka_publish")
+stage_histogram = Histogram(
+    'log_producer_stage_duration_seconds', 'Time spent in each producer pipeline stage', ['stage'],
+    buckets=(.0001, .00025, .0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+)
+# Children bound once, since labels() takes a lock on every call
+stage_latency = {stage: stage_histogram.labels(stage=stage) for stage in STAGES}
+# Updated wherever the pipeline runs; with PRODUCER_PROCESSES > 1 the workers
+# ship them with their stats and the parent's /metrics sums them
+PIPELINE_METRICS = (
+    logs_generated, log_latency, send_errors, send_retries, batch_size_observed,
+    send_latency, delivery_latency, processor_shards, stage_histogram
+)
+PIPELINE_FAMILIES = {family.name for metric in PIPELINE_METRICS for family in metric.collect()}
 
 # Configuration from environment
 PROCESSOR_URL = os.getenv('PROCESSOR_URL', 'http://log-processor:8080')
-LOG_RATE = int(os.getenv('LOG_RATE', '10'))  # logs per second
-
-class LogEntry(BaseModel):
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
-    level: str
-    service: str
-    message: str
-    trace_id: Optional[str] = None
-    user_id: Optional[str] = None
-    
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
+LOG_RATE = float(os.getenv('LOG_RATE', '10'))  # logs per second
+GENERATOR_WORKERS = int(os.getenv('GENERATOR_WORKERS', '1'))
+# >1 fans generation out to worker processes, one event loop each
+PRODUCER_PROCESSES = int(os.getenv('PRODUCER_PROCESSES', '1'))
+TEMPLATE_POOL_SIZE = int(os.getenv('TEMPLATE_POOL_SIZE', '65536'))
+MAX_INFLIGHT_LOGS = int(os.getenv('MAX_INFLIGHT_LOGS', '10000'))
+SEND_BATCH_SIZE = int(os.getenv('SEND_BATCH_SIZE', '100'))
+SEND_BATCH_LINGER_MS = int(os.getenv('SEND_BATCH_LINGER_MS', '50'))
+SEND_CONCURRENCY = int(os.getenv('SEND_CONCURRENCY', '4'))
+SEND_MAX_RETRIES = int(os.getenv('SEND_MAX_RETRIES', '3'))
+HTTP2_ENABLED = os.getenv('HTTP2_ENABLED', 'false').lower() == 'true'
+# "http" posts NDJSON batches to the processor, "kafka" publishes to KAFKA_TOPIC
+LOG_SINK = os.getenv('LOG_SINK', 'http')
+KAFKA_BOOTSTRAP_SERVERS = os.getenv('KAFKA_BOOTSTRAP_SERVERS', 'kafka:9092')
+KAFKA_TOPIC = os.getenv('KAFKA_TOPIC', 'logs')
+KAFKA_COMPRESSION = os.getenv('KAFKA_COMPRESSION', 'gzip') or None
+SEND_TIMEOUT = 5.0
+RETRY_BASE_DELAY = 0.1
+RETRY_MAX_DELAY = 5.0
+RATE_SAMPLE_INTERVAL = 5.0
+# Headless service (host:port) whose A records are the ready processor pods.
+# Empty sends everything to PROCESSOR_URL.
+PROCESSOR_PEERS = os.getenv('PROCESSOR_PEERS', '')
+# Log field hashed onto the ring (and used as the Kafka message key): service or trace_id
+ROUTING_KEY = os.getenv('ROUTING_KEY', 'trace_id')
+RING_VNODES = int(os.getenv('RING_VNODES', '128'))
+DISCOVERY_INTERVAL = float(os.getenv('DISCOVERY_INTERVAL', '10'))
+# /debug/profile needs this value in X-Debug-Token; empty disables the endpoint
+DEBUG_PROFILE_TOKEN = os.getenv('DEBUG_PROFILE_TOKEN', '')
+MAX_PROFILE_SECONDS = int(os.getenv('MAX_PROFILE_SECONDS', '60'))
+profile_lock = asyncio.Lock()
+
+# Long-lived pooled client shared by all senders to PROCESSOR_URL
+http_client: Optional[httpx.AsyncClient] = None
+# One pooled client per discovered processor replica, so each host keeps its
+# own SEND_CONCURRENCY keep-alive connections
+processor_clients: Dict[str, httpx.AsyncClient] = {}
+kafka_producer: Optional[AIOKafkaProducer] = None
+ring: Optional["HashRing"] = None
+log_queue: Optional[asyncio.Queue] = None
+# Set while fewer than MAX_INFLIGHT_LOGS logs are queued or being sent
+inflight_window: Optional[asyncio.Event] = None
+# Multi-process mode: worker processes and their latest stats snapshots
+worker_processes: List[multiprocessing.Process] = []
+worker_snapshots = {}
+stats_collector: Optional[asyncio.Task] = None
 
 class LogStats(BaseModel):
     total_generated: int
     current_rate: float
+    target_rate: float
+    scheduled: int
+    in_flight: int
+    latency_p50_ms: float
+    latency_p99_ms: float
+    latency_p999_ms: float
     processor_healthy: bool
 
+class LatencyHistogram:
+    """Log-bucketed histogram (~2% relative error) for latency percentiles"""
+
+    def __init__(self, min_value: float = 1e-5, max_value: float = 120.0, growth: float = 1.02):
+        self.min_value = min_value
+        self.log_growth = math.log(growth)
+        self.counts = [0] * (int(math.log(max_value / min_value) / self.log_growth) + 2)
+        self.total = 0
+
+    def record(self, value: float):
+        if value <= self.min_value:
+            index = 0
+        else:
+            index = min(
+                len(self.counts) - 1,
+                int(math.log(value / self.min_value) / self.log_growth) + 1
+            )
+        self.counts[index] += 1
+        self.total += 1
+
+    def merge(self, counts: List[int]):
+        for index, count in enumerate(counts):
+            self.counts[index] += count
+        self.total += sum(counts)
+
+    def percentile(self, p: float) -> float:
+        if not self.total:
+            return 0.0
+        rank = math.ceil(self.total * p / 100)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.min_value * math.exp(self.log_growth * index)
+        return self.min_value * math.exp(self.log_growth * (len(self.counts) - 1))
+
+def ring_hash(value: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(value, digest_size=8).digest(), "big")
+
+class HashRing:
+    """Consistent-hash ring of processor base URLs with virtual nodes.
+
+    Adding or removing a replica only moves the keys on its own arcs.
+    """
+
+    def __init__(self, nodes: List[str], vnodes: int = RING_VNODES):
+        self.nodes = sorted(nodes)
+        points = sorted(
+            (ring_hash(f"{node}#{i}".encode()), node)
+            for node in self.nodes for i in range(vnodes)
+        )
+        self.hashes = [point for point, _ in points]
+        self.owners = [node for _, node in points]
+
+    def node_for(self, key: bytes) -> str:
+        index = bisect.bisect(self.hashes, ring_hash(key)) % len(self.hashes)
+        return self.owners[index]
+
 # Log templates for realistic data
 LOG_TEMPLATES = [
     {"level": "INFO", "service": "api-gateway", "message": "Request processed successfully"},
@@ -56,74 +196,430 @@ LOG_TEMPLATES = [
     {"level": "INFO", "service": "notification", "message": "Push notification sent"},
 ]
 
+class TemplatePool:
+    """Pre-generated logs, sampled in bulk with NumPy.
+
+    Each entry is the NDJSON encoding of a log minus its timestamp, so producing
+    a log costs one timestamp format and a bytes concatenation.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.rng = np.random.default_rng()
+        # Template JSON without braces: '"level": ..., "service": ..., "message": ...'
+        self.template_bodies = [
+            json.dumps(template)[1:-1].encode() for template in LOG_TEMPLATES
+        ]
+        self.service_keys = [template["service"].encode() for template in LOG_TEMPLATES]
+        self.refill()
+
+    def refill(self):
+        templates = self.rng.integers(0, len(LOG_TEMPLATES), self.size)
+        trace_ids = self.rng.integers(1000, 10000, self.size)
+        user_ids = self.rng.integers(1, 1001, self.size)
+        if ROUTING_KEY == "service":
+            self.keys = [self.service_keys[t] for t in templates.tolist()]
+        else:
+            self.keys = [b"trace-%d" % trace_id for trace_id in trace_ids.tolist()]
+        self.entries = [
+            b'",' + self.template_bodies[t]
+            + b',"trace_id":"trace-%d","user_id":"user-%d"}' % (trace_id, user_id)
+            for t, trace_id, user_id in zip(templates.tolist(), trace_ids.tolist(), user_ids.tolist())
+        ]
+        self.position = 0
+
+    def next_log(self) -> Tuple[bytes, bytes]:
+        """Return (routing key, NDJSON line)"""
+        if self.position >= self.size:
+            self.refill()
+        entry = self.entries[self.position]
+        key = self.keys[self.position]
+        self.position += 1
+        return key, b'{"timestamp":"' + datetime.utcnow().isoformat().encode() + entry
+
+template_pool: Optional[TemplatePool] = None
+latency_histogram = LatencyHistogram()
+
 stats = {
     "total": 0,
     "rate": 0.0,
+    "scheduled": 0,
+    "in_flight": 0,
     "processor_healthy": True
 }
 
 async def check_processor_health():
     """Check if log processor is healthy"""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{PROCESSOR_URL}/health", timeout=2.0)
-            stats["processor_healthy"] = response.status_code == 200
-            return response.status_code == 200
+        response = await http_client.get(f"{PROCESSOR_URL}/health", timeout=2.0)
+        stats["processor_healthy"] = response.status_code == 200
+        return response.status_code == 200
     except Exception as e:
         logger.error(f"Processor health check failed: {e}")
         stats["processor_healthy"] = False
         return False
 
-async def generate_log() -> LogEntry:
-    """Generate a realistic log entry"""
-    template = random.choice(LOG_TEMPLATES)
-    return LogEntry(
-        level=template["level"],
-        service=template["service"],
-        message=template["message"],
-        trace_id=f"trace-{random.randint(1000, 9999)}",
-        user_id=f"user-{random.randint(1, 1000)}"
-    )
+def generate_log() -> Tuple[bytes, bytes]:
+    """Generate a realistic log entry as (routing key, NDJSON line)"""
+    return template_pool.next_log()
 
-async def send_log(log_entry: LogEntry):
-    """Send log to processor service"""
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{PROCESSOR_URL}/logs",
-                json=json.loads(log_entry.json()),
-                timeout=5.0
-            )
-            if response.status_code == 200:
-                logs_generated.inc()
-                stats["total"] += 1
-            else:
-                send_errors.inc()
-                logger.error(f"Failed to send log: {response.status_code}")
-    except Exception as e:
-        send_errors.inc()
-        logger.error(f"Error sending log: {e}")
+def send_log(routing_key: bytes, log_line: bytes, scheduled_at: float):
+    """Queue a log for batched shipping to the processor"""
+    stats["in_flight"] += 1
+    if stats["in_flight"] >= MAX_INFLIGHT_LOGS:
+        inflight_window.clear()
+    log_queue.put_nowait((scheduled_at, log_line, routing_key))
+
+def complete_logs(batch: List[tuple], delivered: bool):
+    """Record delivery latency and release in-flight window slots"""
+    if delivered:
+        now = time.monotonic()
+        for scheduled_at, _, _ in batch:
+            latency = now - scheduled_at
+            delivery_latency.observe(latency)
+            latency_histogram.record(latency)
+    stats["in_flight"] -= len(batch)
+    if stats["in_flight"] < MAX_INFLIGHT_LOGS:
+        inflight_window.set()
+
+def retry_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Exponential backoff with full jitter, honouring Retry-After"""
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+async def send_batch_kafka(batch: List[tuple]) -> bool:
+    """Publish one message per log line; the client batches, compresses and retries them"""
+    batch_size_observed.observe(len(batch))
+
+    with send_latency.time(), stage_latency["kafka_publish"].time():
+        try:
+            acks = [await kafka_producer.send(KAFKA_TOPIC, line, key=key) for _, line, key in batch]
+            await asyncio.gather(*acks)
+        except KafkaError as e:
+            send_errors.inc(len(batch))
+            logger.error(f"Failed to publish batch of {len(batch)} logs: {e}")
+            return False
 
-async def log_generator():
-    """Background task to generate logs continuously"""
+    logs_generated.inc(len(batch))
+    stats["total"] += len(batch)
+    return True
+
+async def send_batch(batch: List[tuple], processor_url: str = PROCESSOR_URL):
+    """Ship one batch of (scheduled_at, log line, routing key) as NDJSON, retrying transient failures"""
+    if LOG_SINK == "kafka":
+        return await send_batch_kafka(batch)
+
+    with stage_latency["encode"].time():
+        body = b"\n".join(line for _, line, _ in batch)
+    batch_size_observed.observe(len(batch))
+
+    with send_latency.time():
+        for attempt in range(SEND_MAX_RETRIES + 1):
+            retry_after = None
+            try:
+                with stage_latency["http_post"].time():
+                    response = await client_for(processor_url).post(
+                        f"{processor_url}/logs/batch",
+                        content=body,
+                        headers={"Content-Type": "application/x-ndjson"},
+                        timeout=SEND_TIMEOUT
+                    )
+                if response.status_code == 200:
+                    with stage_latency["response_decode"].time():
+                        result = response.json()
+                    logs_generated.inc(result["accepted"])
+                    stats["total"] += result["accepted"]
+                    if result["rejected"]:
+                        send_errors.inc(result["rejected"])
+                        logger.error(f"Processor rejected {result['rejected']} logs")
+                    return True
+                if response.status_code != 429 and response.status_code < 500:
+                    send_errors.inc(len(batch))
+                    logger.error(f"Failed to send batch: {response.status_code}")
+                    return False
+                retry_after = response.headers.get("Retry-After")
+                logger.warning(f"Processor returned {response.status_code}, retrying")
+            except httpx.HTTPError as e:
+                logger.warning(f"Error sending batch: {e}")
+
+            if attempt < SEND_MAX_RETRIES:
+                send_retries.inc()
+                await asyncio.sleep(retry_delay(attempt, retry_after))
+
+    send_errors.inc(len(batch))
+    logger.error(f"Dropped batch of {len(batch)} logs after {SEND_MAX_RETRIES} retries")
+    return False
+
+def client_for(processor_url: str) -> httpx.AsyncClient:
+    if processor_url == PROCESSOR_URL:
+        return http_client
+    client = processor_clients.get(processor_url)
+    if client is None:
+        client = processor_clients[processor_url] = create_http_client()
+    return client
+
+async def close_client_later(client: httpx.AsyncClient):
+    """Close a departed replica's client once its in-flight sends have had time to finish"""
+    await asyncio.sleep((SEND_MAX_RETRIES + 1) * (SEND_TIMEOUT + RETRY_MAX_DELAY))
+    await client.aclose()
+
+def route_batch(batch: List[tuple]) -> Dict[str, List[tuple]]:
+    """Split a batch by the processor replica owning each log's routing key"""
+    if ring is None or LOG_SINK == "kafka":
+        return {PROCESSOR_URL: batch}
+    shards = {}
+    for item in batch:
+        shards.setdefault(ring.node_for(item[2]), []).append(item)
+    return shards
+
+async def discover_processors():
+    """Rebuild the ring from the headless service's A records (ready pods only)"""
+    global ring
+    host, _, port = PROCESSOR_PEERS.partition(":")
+    port = int(port or 8080)
     while True:
         try:
-            with log_latency.time():
-                log_entry = await generate_log()
-                await send_log(log_entry)
-            
-            # Rate limiting
-            await asyncio.sleep(1.0 / LOG_RATE)
+            addresses = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+            nodes = sorted({f"http://{address[4][0]}:{port}" for address in addresses})
+            if nodes and (ring is None or ring.nodes != nodes):
+                ring = HashRing(nodes)
+                for url in set(processor_clients) - set(nodes):
+                    asyncio.create_task(close_client_later(processor_clients.pop(url)))
+                processor_shards.set(len(nodes))
+                logger.info(f"Routing across {len(nodes)} processor replicas: {nodes}")
+        except OSError as e:
+            # Keep the last known ring; with none yet, logs go to PROCESSOR_URL
+            logger.warning(f"Processor discovery failed for {host}: {e}")
+        await asyncio.sleep(DISCOVERY_INTERVAL)
+
+async def batch_shipper():
+    """Drain the queue into batches of SEND_BATCH_SIZE logs or SEND_BATCH_LINGER_MS"""
+    slots = asyncio.Semaphore(SEND_CONCURRENCY)
+    linger = SEND_BATCH_LINGER_MS / 1000
+
+    async def ship_shard(batch: List[tuple], processor_url: str):
+        delivered = False
+        try:
+            delivered = await send_batch(batch, processor_url)
+        finally:
+            complete_logs(batch, delivered)
+
+    async def ship(batch: List[tuple]):
+        try:
+            with stage_latency["route"].time():
+                shards = route_batch(batch)
+            await asyncio.gather(*(ship_shard(shard, url) for url, shard in shards.items()))
+        finally:
+            slots.release()
+
+    while True:
+        batch = [await log_queue.get()]
+        fill_started = time.monotonic()
+        deadline = fill_started + linger
+        while len(batch) < SEND_BATCH_SIZE:
+            if not log_queue.empty():
+                batch.append(log_queue.get_nowait())
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(log_queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        stage_latency["batch_fill"].observe(time.monotonic() - fill_started)
+        await slots.acquire()
+        # Oldest log's wait from its scheduled time until its batch ships
+        stage_latency["queue_wait"].observe(time.monotonic() - batch[0][0])
+        asyncio.create_task(ship(batch))
+
+async def log_generator(rate: float, offset: float):
+    """Open-loop generator: issue logs on a fixed timeline, independent of send completion.
+
+    Sends that fall behind schedule (slow event loop, full in-flight window) are
+    issued in a burst to catch up, and their latency is still measured from the
+    scheduled time.
+    """
+    interval = 1.0 / rate
+    next_send = time.monotonic() + offset * interval
+    while True:
+        try:
+            delay = next_send - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            now = time.monotonic()
+            while next_send <= now:
+                await inflight_window.wait()
+                with log_latency.time():
+                    routing_key, log_line = generate_log()
+                send_log(routing_key, log_line, next_send)
+                stats["scheduled"] += 1
+                next_send += interval
         except Exception as e:
             logger.error(f"Error in log generator: {e}")
             await asyncio.sleep(1)
 
+async def rate_sampler():
+    """Track the acknowledged rate against the target"""
+    last_total, last_time = stats["total"], time.monotonic()
+    while True:
+        await asyncio.sleep(RATE_SAMPLE_INTERVAL)
+        now = time.monotonic()
+        stats["rate"] = (stats["total"] - last_total) / (now - last_time)
+        achieved_rate_gauge.set(stats["rate"])
+        last_total, last_time = stats["total"], now
+
+def create_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=HTTP2_ENABLED,
+        limits=httpx.Limits(
+            max_connections=SEND_CONCURRENCY + 1,
+            max_keepalive_connections=SEND_CONCURRENCY + 1
+        )
+    )
+
+def create_kafka_producer() -> AIOKafkaProducer:
+    return AIOKafkaProducer(
+        bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
+        acks="all",
+        linger_ms=SEND_BATCH_LINGER_MS,
+        compression_type=KAFKA_COMPRESSION
+    )
+
+async def start_pipeline(rate: float):
+    """Start the shipper, generator timelines and rate sampler in this process"""
+    global log_queue, inflight_window, template_pool, kafka_producer
+    if LOG_SINK == "kafka":
+        kafka_producer = create_kafka_producer()
+        await kafka_producer.start()
+    template_pool = TemplatePool(TEMPLATE_POOL_SIZE)
+    log_queue = asyncio.Queue()
+    inflight_window = asyncio.Event()
+    inflight_window.set()
+    if PROCESSOR_PEERS and LOG_SINK == "http":
+        asyncio.create_task(discover_processors())
+    asyncio.create_task(batch_shipper())
+    # Each worker runs its own timeline, staggered across the interval
+    for worker in range(GENERATOR_WORKERS):
+        asyncio.create_task(log_generator(rate / GENERATOR_WORKERS, worker / GENERATOR_WORKERS))
+    asyncio.create_task(rate_sampler())
+
+def pipeline_samples() -> Dict[str, list]:
+    """This process's pipeline metric samples as (name, labels, value), by family"""
+    return {
+        family.name: [
+            (sample.name, tuple(sorted(sample.labels.items())), sample.value)
+            for sample in family.samples
+            # Creation timestamps don't add up across processes
+            if not sample.name.endswith("_created")
+        ]
+        for metric in PIPELINE_METRICS
+        for family in metric.collect()
+    }
+
+async def run_worker_async(worker_id: int, rate: float, stats_queue):
+    global http_client
+    http_client = create_http_client()
+    await start_pipeline(rate)
+    while True:
+        await asyncio.sleep(RATE_SAMPLE_INTERVAL)
+        stats_queue.put((worker_id, dict(stats), latency_histogram.counts, pipeline_samples()))
+
+def run_worker(worker_id: int, rate: float, stats_queue):
+    """Worker process entry point: one event loop with its share of LOG_RATE"""
+    asyncio.run(run_worker_async(worker_id, rate, stats_queue))
+
+async def collect_worker_stats(stats_queue):
+    """Keep the latest snapshot from each worker process"""
+    while True:
+        # Bounded wait, so the executor thread exits soon after shutdown cancels this task
+        try:
+            worker_id, snapshot, counts, samples = await asyncio.to_thread(stats_queue.get, timeout=1.0)
+        except queue.Empty:
+            continue
+        worker_snapshots[worker_id] = (snapshot, counts, samples)
+        achieved_rate_gauge.set(sum(s["rate"] for s, _, _ in worker_snapshots.values()))
+
+class WorkerMetricsRegistry:
+    """The parent's registry with pipeline families summed over worker snapshots"""
+
+    def collect(self):
+        for family in REGISTRY.collect():
+            if family.name not in PIPELINE_FAMILIES:
+                yield family
+                continue
+            values = {}
+            for _, _, samples in worker_snapshots.values():
+                for name, labels, value in samples.get(family.name, ()):
+                    if family.type == "gauge":
+                        values[name, labels] = max(values.get((name, labels), value), value)
+                    else:
+                        values[name, labels] = values.get((name, labels), 0) + value
+            merged = Metric(family.name, family.documentation, family.type, family.unit)
+            for (name, labels), value in values.items():
+                merged.add_sample(name, dict(labels), value)
+            yield merged
+
+worker_metrics_registry = WorkerMetricsRegistry()
+
+def aggregate_stats():
+    """Stats and latency histogram for this process, or summed across workers"""
+    if not worker_processes:
+        return stats, latency_histogram
+
+    totals = {"total": 0, "rate": 0.0, "scheduled": 0, "in_flight": 0}
+    histogram = LatencyHistogram()
+    for snapshot, counts, _ in worker_snapshots.values():
+        for key in totals:
+            totals[key] += snapshot[key]
+        histogram.merge(counts)
+    totals["processor_healthy"] = stats["processor_healthy"]
+    return totals, histogram
+
 @app.on_event("startup")
 async def startup_event():
     """Start background log generation"""
-    asyncio.create_task(log_generator())
+    global http_client, stats_collector
+    http_client = create_http_client()
+    target_rate_gauge.set(LOG_RATE)
+
+    if PRODUCER_PROCESSES > 1:
+        ctx = multiprocessing.get_context("spawn")
+        stats_queue = ctx.Queue()
+        for worker_id in range(PRODUCER_PROCESSES):
+            process = ctx.Process(
+                target=run_worker,
+                args=(worker_id, LOG_RATE / PRODUCER_PROCESSES, stats_queue),
+                daemon=True
+            )
+            process.start()
+            worker_processes.append(process)
+        stats_collector = asyncio.create_task(collect_worker_stats(stats_queue))
+    else:
+        await start_pipeline(LOG_RATE)
+
     asyncio.create_task(periodic_health_check())
-    logger.info(f"Log producer started - generating {LOG_RATE} logs/second")
+    logger.info(
+        f"Log producer started - generating {LOG_RATE} logs/second "
+        f"across {PRODUCER_PROCESSES} process(es)"
+    )
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop worker processes and close pooled connections"""
+    if stats_collector:
+        stats_collector.cancel()
+    for process in worker_processes:
+        process.terminate()
+    if kafka_producer:
+        await kafka_producer.stop()
+    if http_client:
+        await http_client.aclose()
+    for client in processor_clients.values():
+        await client.aclose()
 
 async def periodic_health_check():
     """Periodically check processor health"""
@@ -146,16 +642,50 @@ async def readiness_check():
 @app.get("/stats")
 async def get_stats() -> LogStats:
     """Get log generation statistics"""
+    current, histogram = aggregate_stats()
     return LogStats(
-        total_generated=stats["total"],
-        current_rate=LOG_RATE,
-        processor_healthy=stats["processor_healthy"]
+        total_generated=current["total"],
+        current_rate=current["rate"],
+        target_rate=LOG_RATE,
+        scheduled=current["scheduled"],
+        in_flight=current["in_flight"],
+        latency_p50_ms=histogram.percentile(50) * 1000,
+        latency_p99_ms=histogram.percentile(99) * 1000,
+        latency_p999_ms=histogram.percentile(99.9) * 1000,
+        processor_healthy=current["processor_healthy"]
+    )
+
+@app.get("/debug/profile", response_class=PlainTextResponse)
+async def debug_profile(
+    seconds: float = Query(default=10, gt=0),
+    hz: int = Query(default=100, ge=1, le=1000),
+    x_debug_token: Optional[str] = Header(default=None)
+):
+    """Sample this process's stacks for `seconds` and return collapsed stacks.
+
+    With PRODUCER_PROCESSES > 1 the workers generate and ship logs in their own
+    processes, which this does not sample.
+    """
+    if not DEBUG_PROFILE_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_debug_token or not hmac.compare_digest(x_debug_token, DEBUG_PROFILE_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid debug token")
+    if seconds > MAX_PROFILE_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be at most {MAX_PROFILE_SECONDS}")
+    if profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    async with profile_lock:
+        stacks = await asyncio.to_thread(profiler.sample_stacks, seconds, hz)
+    return PlainTextResponse(
+        profiler.collapse(stacks),
+        headers={"Content-Disposition": f'attachment; filename="{socket.gethostname()}-profile.folded"'}
     )
 
 @app.get("/metrics")
 async def metrics():
     """Prometheus metrics endpoint"""
-    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+    registry = worker_metrics_registry if worker_processes else REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
 
 if __name__ == "__main__":
     import uvicorn
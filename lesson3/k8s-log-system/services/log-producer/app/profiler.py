@@ -0,0 +1,56 @@
+"""Sampling profiler behind /debug/profile.
+
+A thread wakes ``hz`` times a second and records the stack of every other
+thread via ``sys._current_frames()``. Nothing is traced between samples, so
+the service keeps running at full speed while it is profiled. The event loop
+thread shows the coroutine running at each sample, or ``select`` when idle.
+
+Output is the collapsed stack format (``thread;outer;inner count`` per line)
+read by flamegraph.pl, speedscope and inferno.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict
+
+_frame_names: Dict[object, str] = {}
+
+
+def frame_name(code) -> str:
+    name = _frame_names.get(code)
+    if name is None:
+        qualname = getattr(code, "co_qualname", code.co_name)
+        name = f"{qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        _frame_names[code] = name
+    return name
+
+
+def sample_stacks(seconds: float, hz: int) -> Counter:
+    """Collapsed stack -> number of samples, over `seconds`"""
+    own = threading.get_ident()
+    thread_names = {}
+    stacks = Counter()
+    interval = 1.0 / hz
+    next_sample = time.perf_counter()
+    deadline = next_sample + seconds
+    while next_sample < deadline:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            if thread_id not in thread_names:
+                thread_names.update((thread.ident, thread.name) for thread in threading.enumerate())
+            frames = []
+            while frame is not None:
+                frames.append(frame_name(frame.f_code))
+                frame = frame.f_back
+            frames.append(thread_names.get(thread_id, f"thread-{thread_id}"))
+            stacks[";".join(reversed(frames))] += 1
+        next_sample += interval
+        time.sleep(max(0.0, next_sample - time.perf_counter()))
+    return stacks
+
+
+def collapse(stacks: Counter) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())